@@ -1,13 +1,21 @@
+from auto import AutoAlgorithm
 from diagonal import DiagonalAlgorithm
+from grid import GridAlgorithm
 from horizontal import HorizontalAlgorithm
 from horizontal_bottom import HorizontalBottomAlgorithm
+from maxrects import MaxRectsAlgorithm
+from skyline import SkylineAlgorithm
 from square import SquareAlgorithm
 from vertical import VerticalAlgorithm
 from vertical_right import VerticalRightAlgorithm
 
-algorithms = {'diagonal': DiagonalAlgorithm,
+algorithms = {'auto': AutoAlgorithm,
+              'diagonal': DiagonalAlgorithm,
+              'grid': GridAlgorithm,
               'horizontal': HorizontalAlgorithm,
               'horizontal-bottom': HorizontalBottomAlgorithm,
+              'maxrects': MaxRectsAlgorithm,
+              'skyline': SkylineAlgorithm,
               'square': SquareAlgorithm,
               'vertical': VerticalAlgorithm,
               'vertical-right': VerticalRightAlgorithm}
@@ -0,0 +1,97 @@
+import time
+import multiprocessing
+from collections import namedtuple
+
+from glue.algorithms.layout import LayoutSprite, sort_layout
+
+
+# Picklable stand-in of an image with only what the algorithms need.
+PackingImage = namedtuple('PackingImage', ['index', 'filename', 'width', 'height',
+                                           'absolute_width', 'absolute_height'])
+
+
+def pack_worker(args):
+    """Place ``images`` using this algorithm and ordering and return the
+    index of the candidate, the position of every image (by index) and the
+    size of the canvas."""
+    index, algorithm_cls, ordering, images, config = args
+    sprite = LayoutSprite(sort_layout(images, ordering), config)
+    algorithm_cls().process(sprite)
+
+    positions = dict([(r.image.index, (r.x, r.y, r.rotated)) for r in sprite.layout])
+    return index, positions, sprite.size
+
+
+class AutoAlgorithm(object):
+    """Try several algorithms and orderings and keep the layout with the
+    smallest canvas.
+
+    Candidates are only packed, no pixels are involved. If ``jobs`` is
+    greater than one they are packed in parallel using a pool of
+    processes. Once ``auto_budget`` seconds have passed, the best layout
+    found so far is used. Candidates already being packed are never
+    interrupted, so a slow one can still exceed the budget when there is
+    no other layout to use, or when packing them one by one.
+    """
+
+    candidates = [('skyline', 'maxside'), ('skyline', 'area'),
+                  ('skyline', 'height'), ('skyline', 'width'),
+                  ('square', 'maxside'), ('square', 'area'),
+                  ('square', 'height'), ('square', 'width'),
+                  ('grid', 'maxside'),
+                  ('vertical', 'maxside'), ('horizontal', 'maxside'),
+                  ('maxrects', 'maxside'), ('maxrects', 'area'),
+                  ('maxrects', 'height'), ('maxrects', 'width')]
+
+    def process(self, sprite):
+        from glue.algorithms import algorithms
+
+        # Candidates are packed using the original orientation of every
+        # image, the one positions are applied to.
+        for record in sprite.layout:
+            record.rotate(False)
+        images = [PackingImage(i, r.image.filename, r.width, r.height,
+                               r.absolute_width, r.absolute_height)
+                  for i, r in enumerate(sprite.layout)]
+        config = {'maxrects_heuristic': sprite.config['maxrects_heuristic'],
+                  'allow_rotation': sprite.config['allow_rotation']}
+        tasks = [(i, algorithms[a], o, images, dict(config, algorithm=a, algorithm_ordering=o))
+                 for i, (a, o) in enumerate(self.candidates)]
+
+        deadline = time.time() + float(sprite.config['auto_budget'])
+        jobs = min(int(sprite.config['jobs']), len(tasks))
+        results = {}
+        if jobs > 1:
+            pool = multiprocessing.Pool(jobs)
+            try:
+                # Candidates finishing early are kept even if a previous
+                # one is still being packed once the budget is over.
+                iterator = pool.imap_unordered(pack_worker, tasks)
+                for task in tasks:
+                    timeout = max(deadline - time.time(), 0) if results else None
+                    try:
+                        index, positions, size = iterator.next(timeout)
+                    except multiprocessing.TimeoutError:
+                        break
+                    results[index] = (positions, size)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            for task in tasks:
+                if results and time.time() > deadline:
+                    break
+                index, positions, size = pack_worker(task)
+                results[index] = (positions, size)
+
+        def score(index):
+            width, height = results[index][1]
+            return (width * height, max(width, height), index)
+
+        best = min(results, key=score)
+        positions = results[best][0]
+        for i, record in enumerate(sprite.layout):
+            record.x, record.y, rotated = positions[i]
+            record.rotate(rotated)
+
+        sprite.algorithm, sprite.algorithm_ordering = self.candidates[best]
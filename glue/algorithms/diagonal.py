@@ -2,7 +2,7 @@ class DiagonalAlgorithm(object):
 
     def process(self, sprite):
         x = y = 0
-        for image in sprite.images:
+        for image in sprite.layout:
             image.x = x
             image.y = y
             x += image.absolute_width
@@ -0,0 +1,72 @@
+import math
+
+from glue.helpers import next_power_of_two
+
+
+class GridAlgorithm(object):
+    """Place the images in the cells of a grid.
+
+    If all the images have the same size they are placed in a near-square
+    grid. Otherwise images are grouped by size class and every group uses
+    cells as large as its largest image. Groups are placed in rows of the
+    same width, one after the other from the tallest cells down.
+    """
+
+    def process(self, sprite):
+        groups = {}
+        classes = []
+        for image in sprite.layout:
+            size_class = (self.size_class(image.absolute_width),
+                          self.size_class(image.absolute_height))
+            if size_class not in groups:
+                groups[size_class] = []
+                classes.append(size_class)
+            groups[size_class].append(image)
+
+        # Every cell is as large as the largest image of its class
+        sizes = [(max([i.absolute_width for i in groups[c]]),
+                  max([i.absolute_height for i in groups[c]])) for c in classes]
+
+        if len(sizes) == 1:
+            columns = int(math.ceil(math.sqrt(len(sprite.layout))))
+            self.place(sprite.layout, sizes[0], columns, 0)
+            return
+
+        area = sum([w * h * len(groups[c]) for c, (w, h) in zip(classes, sizes)])
+        width = max(max([w for w, h in sizes]), int(math.ceil(math.sqrt(area))))
+
+        # The last row of a group is completed using the cells of the next
+        # one, so sprites with many sizes don't waste a row for each of them.
+        x = y = row_height = 0
+        for size, size_class in sorted(zip(sizes, classes), key=lambda s: (-s[0][1], -s[0][0])):
+            cell_width, cell_height = size
+            for image in groups[size_class]:
+                if x + cell_width > width:
+                    x, y, row_height = 0, y + row_height, 0
+                image.x, image.y = x, y
+                x += cell_width
+                row_height = max(row_height, cell_height)
+
+    def size_class(self, value):
+        """Return the size class of ``value``: the smallest power of two,
+        or three quarters of one, not smaller than it."""
+        power = next_power_of_two(value)
+        if power * 3 % 4 == 0 and value <= power * 3 // 4:
+            return power * 3 // 4
+        return power
+
+    def place(self, images, size, columns, y):
+        """Place ``images`` of this ``size`` in a grid with this number of
+        ``columns`` starting at ``y``. Return the bottom of the grid.
+
+        :param images: Images to place.
+        :param size: Size of every cell.
+        :param columns: Number of columns.
+        :param y: Y coordinate of the first row.
+        """
+        width, height = size
+        for i, image in enumerate(images):
+            row, column = divmod(i, columns)
+            image.x = column * width
+            image.y = y + row * height
+        return y + int(math.ceil(len(images) / float(columns))) * height
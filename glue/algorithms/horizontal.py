@@ -2,7 +2,7 @@ class HorizontalAlgorithm(object):
 
     def process(self, sprite):
         x = 0
-        for image in sprite.images:
+        for image in sprite.layout:
             image.y = 0
             image.x = x
             x += image.absolute_width
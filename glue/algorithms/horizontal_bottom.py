@@ -1,9 +1,9 @@
 class HorizontalBottomAlgorithm(object):
 
     def process(self, sprite):
-        max_height = max([i.height for i in sprite.images])
+        max_height = max([i.height for i in sprite.layout])
         x = 0
-        for image in sprite.images:
+        for image in sprite.layout:
             image.y = max_height - image.height
             image.x = x
             x += image.absolute_width
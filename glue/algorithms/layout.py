@@ -0,0 +1,98 @@
+class LayoutRecord(object):
+    """Compact representation of an :class:`~glue.core.Image` used while
+    ordering and placing the images of a sprite.
+
+    Sizes and the ordering key are calculated only once per image, so
+    algorithms can access them as plain attributes. Positions are written
+    back to the image using :meth:`~LayoutRecord.apply`.
+    """
+
+    __slots__ = ('image', 'width', 'height', 'absolute_width',
+                 'absolute_height', 'key', 'x', 'y', 'rotated')
+
+    def __init__(self, image, ordering):
+        """Record constructor.
+
+        :param image: Source :class:`~glue.core.Image`.
+        :param ordering: Ordering criteria without the leading '-'.
+        """
+        self.image = image
+        self.width = image.width
+        self.height = image.height
+        self.absolute_width = image.absolute_width
+        self.absolute_height = image.absolute_height
+        self.x = self.y = None
+        self.rotated = False
+
+        if ordering == 'filename':
+            self.key = image.filename
+        elif ordering == 'width':
+            self.key = self.absolute_width
+        elif ordering == 'height':
+            self.key = self.absolute_height
+        elif ordering == 'area':
+            self.key = self.absolute_width * self.absolute_height
+        else:
+            self.key = max(self.absolute_width, self.absolute_height)
+
+    def __lt__(self, record):
+        """Same criteria as :meth:`glue.core.Image.__lt__` using the
+        precalculated key, so the resulting order is exactly the same."""
+        return self.key <= record.key
+
+    def rotate(self, rotated=True):
+        """Rotate the record 90 degrees clockwise, or restore its original
+        orientation if ``rotated`` is ``False``."""
+        if rotated != self.rotated:
+            self.width, self.height = self.height, self.width
+            self.absolute_width, self.absolute_height = self.absolute_height, self.absolute_width
+            self.rotated = rotated
+
+    def apply(self):
+        """Write the position of this record back to its image."""
+        self.image.x = self.x
+        self.image.y = self.y
+        self.image.rotated = self.rotated
+
+
+class FilenameLayoutRecord(LayoutRecord):
+
+    __slots__ = ()
+
+    def __lt__(self, record):
+        return self.key > record.key
+
+
+class LayoutSprite(object):
+    """Set of layout records placed together by an algorithm.
+
+    Algorithms only use the ``layout`` and ``config`` of a sprite, so this
+    can be used to place a subset of the images of a sprite, or images that
+    aren't part of any sprite. Algorithms like auto update ``algorithm``
+    and ``algorithm_ordering`` with the ones they have finally used.
+    """
+
+    def __init__(self, layout, config):
+        self.layout = layout
+        self.config = config
+        self.algorithm = config['algorithm']
+        self.algorithm_ordering = config['algorithm_ordering']
+
+    @property
+    def size(self):
+        """Return the width and height needed to place all the records."""
+        return (max([r.x + r.absolute_width for r in self.layout]),
+                max([r.y + r.absolute_height for r in self.layout]))
+
+
+def sort_layout(images, ordering):
+    """Return a list of layout records for ``images`` sorted using this
+    ``ordering`` criteria. A leading '-' reverses the ordering.
+
+    :param images: List of images.
+    :param ordering: Ordering criteria.
+    """
+    reverse = ordering[0] != '-'
+    ordering = ordering.lstrip('-')
+    record_cls = FilenameLayoutRecord if ordering == 'filename' else LayoutRecord
+    return sorted([record_cls(image, ordering) for image in images], reverse=reverse)
@@ -0,0 +1,273 @@
+import math
+import collections
+import heapq
+import bisect
+
+
+class MaxRectsBin(object):
+    """Bin keeping the list of maximal free rectangles.
+
+    Free rectangles are indexed in two ways, so no operation needs to look
+    at all of them: sorted by width, so searches skip the ones narrower
+    than the image, and in columns ``cell_size`` pixels wide, so placing an
+    image only splits the rectangles registered in the columns it covers.
+
+    Images of the same size are usually placed one after the other, so the
+    candidates of the last searched size are kept in a heap. New free
+    rectangles are added to it and the ones already used are skipped.
+    """
+
+    def __init__(self, width, height, heuristic, cell_size=64):
+        """Bin constructor.
+
+        :param width: Bin width.
+        :param height: Initial bin height.
+        :param heuristic: Placement heuristic name.
+        :param cell_size: Width of the columns of the index.
+        """
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.score = getattr(self, 'score_' + heuristic.replace('-', '_'))
+        # Free rectangles are stored as (left, top, right, bottom)
+        self.free = []
+        self.cells = collections.defaultdict(set)
+        self.alive = set()
+        self.candidates = self.candidates_size = None
+        self.add((0, 0, width, height))
+
+    def score_best_short_side(self, x, y, leftover_width, leftover_height, width, height):
+        return (min(leftover_width, leftover_height),
+                max(leftover_width, leftover_height), y)
+
+    def score_best_long_side(self, x, y, leftover_width, leftover_height, width, height):
+        return (max(leftover_width, leftover_height),
+                min(leftover_width, leftover_height), y)
+
+    def score_best_area(self, x, y, leftover_width, leftover_height, width, height):
+        return ((width + leftover_width) * (height + leftover_height) - width * height,
+                min(leftover_width, leftover_height), y)
+
+    def score_bottom_left(self, x, y, leftover_width, leftover_height, width, height):
+        return (y + height, x)
+
+    def columns(self, rect):
+        """Return the columns covered by ``rect``."""
+        return range(rect[0] // self.cell_size, (rect[2] - 1) // self.cell_size + 1)
+
+    def add(self, rect):
+        bisect.insort(self.free, (rect[2] - rect[0], rect))
+        self.alive.add(rect)
+        for column in self.columns(rect):
+            self.cells[column].add(rect)
+        if self.candidates is not None:
+            for candidate in self.scores(rect, *self.candidates_size):
+                heapq.heappush(self.candidates, candidate)
+
+    def remove(self, rect):
+        del self.free[bisect.bisect_left(self.free, (rect[2] - rect[0], rect))]
+        self.alive.discard(rect)
+        for column in self.columns(rect):
+            self.cells[column].discard(rect)
+
+    def scores(self, rect, width, height, rotation):
+        """Return the score, position and rotation of every way this image
+        size fits inside ``rect``. Ties are broken using the position, so
+        the result doesn't depend on the order of the free rectangles."""
+        x, y, right, bottom = rect
+        result = []
+        leftover_width = right - x - width
+        leftover_height = bottom - y - height
+        if leftover_width >= 0 and leftover_height >= 0:
+            score = self.score(x, y, leftover_width, leftover_height, width, height)
+            result.append((score, x, False, y, rect))
+
+        if rotation:
+            leftover_width = right - x - height
+            leftover_height = bottom - y - width
+            if leftover_width >= 0 and leftover_height >= 0:
+                score = self.score(x, y, leftover_width, leftover_height, height, width)
+                result.append((score, x, True, y, rect))
+        return result
+
+    def find(self, width, height, rotation=False):
+        """Find the best position to allocate this image size according to
+        the heuristic of this bin. Return the position and whether the image
+        needs to be rotated to use it.
+
+        :param width: Image width.
+        :param height: Image height.
+        :param rotation: Try to rotate the image 90 degrees too.
+        """
+        size = (width, height, rotation and width != height)
+        if size != self.candidates_size:
+            narrowest = min(width, height) if size[2] else width
+            shortest = min(width, height) if size[2] else height
+            start = bisect.bisect_left(self.free, (narrowest,))
+            self.candidates = []
+            for free_width, rect in self.free[start:]:
+                if rect[3] - rect[1] >= shortest:
+                    self.candidates.extend(self.scores(rect, *size))
+            heapq.heapify(self.candidates)
+            self.candidates_size = size
+
+        candidates = self.candidates
+        while candidates and candidates[0][-1] not in self.alive:
+            heapq.heappop(candidates)
+        if not candidates:
+            return None
+        score, x, rotated, y, rect = candidates[0]
+        return (x, y, rotated)
+
+    def grow(self, height):
+        """Grow the bin down extending every free rectangle touching the
+        bottom edge.
+
+        :param height: Pixels to grow down.
+        """
+        old_height = self.height
+        self.height += height
+        extended = [(0, old_height, self.width, self.height)]
+        touching = [rect for free_width, rect in self.free if rect[3] == old_height]
+        for free in touching:
+            self.remove(free)
+            extended.append((free[0], free[1], free[2], self.height))
+        self.insert(extended)
+
+    def place(self, x, y, width, height):
+        """Mark this area as used splitting every free rectangle which
+        intersects it.
+
+        :param x: X coordinate.
+        :param y: Y coordinate.
+        :param width: Image width.
+        :param height: Image height.
+        """
+        right = x + width
+        bottom = y + height
+        intersecting = set()
+        for column in self.columns((x, y, right, bottom)):
+            for free in self.cells.get(column, ()):
+                free_x, free_y, free_right, free_bottom = free
+                if x < free_right and right > free_x and y < free_bottom and bottom > free_y:
+                    intersecting.add(free)
+
+        created = []
+        for free in intersecting:
+            self.remove(free)
+            free_x, free_y, free_right, free_bottom = free
+            if x > free_x:
+                created.append((free_x, free_y, x, free_bottom))
+            if right < free_right:
+                created.append((right, free_y, free_right, free_bottom))
+            if y > free_y:
+                created.append((free_x, free_y, free_right, y))
+            if bottom < free_bottom:
+                created.append((free_x, bottom, free_right, free_bottom))
+        self.insert(created)
+
+    def insert(self, created):
+        """Add the rectangles in ``created`` which aren't contained inside
+        any other free rectangle.
+
+        A rectangle containing another one covers all its columns, so only
+        the rectangles of its first column need to be checked.
+
+        :param created: New free rectangles.
+        """
+        size = self.cell_size
+        for rect in sorted(set(created), key=lambda r: ((r[0] - r[2]) * (r[3] - r[1]), r)):
+            x, y, right, bottom = rect
+            for other_x, other_y, other_right, other_bottom in self.cells.get(x // size, ()):
+                if other_x <= x and other_y <= y and other_right >= right and other_bottom >= bottom:
+                    break
+            else:
+                self.add(rect)
+
+    def discard(self, size):
+        """Forget the free rectangles narrower or shorter than ``size``.
+
+        No image left to place fits inside them, so they only make every
+        search slower. Rectangles contained inside them would be too small
+        too, so they are still correctly ignored. Rectangles touching the
+        bottom edge are kept, as they can become taller if the bin grows.
+
+        :param size: Shortest side of the images left to place.
+        """
+        for free_width, rect in list(self.free):
+            if free_width < size or (rect[3] - rect[1] < size and rect[3] != self.height):
+                self.remove(rect)
+
+
+class MaxRectsAlgorithm(object):
+    """Maximal rectangles packer.
+
+    The bin keeps the list of all the maximal free rectangles, so every
+    image can be placed in any hole left by the previous ones. The bin
+    starts as a square of the same area of all the images and grows down if
+    there is no room left. Several widths are tried and the smallest canvas
+    wins.
+    """
+
+    width_factors = (1.0, 1.1, 1.25)
+
+    def process(self, sprite):
+        heuristic = sprite.config['maxrects_heuristic']
+        rotation = sprite.config['allow_rotation']
+        records = sprite.layout
+        for record in records:
+            record.rotate(False)
+
+        max_width = max([r.absolute_width for r in records])
+        area = sum([r.absolute_width * r.absolute_height for r in records])
+        side = int(math.ceil(math.sqrt(area)))
+
+        best = None
+        widths = sorted(set([max(max_width, int(side * f)) for f in self.width_factors]))
+        for width in widths:
+            positions, size = self.pack(records, width, side, heuristic, rotation)
+            if best is not None and size[0] * size[1] >= best[1][0] * best[1][1]:
+                # Wider bins only waste more space from now on
+                break
+            best = (positions, size)
+
+        for record, (x, y, rotated) in zip(records, best[0]):
+            record.rotate(rotated)
+            record.x = x
+            record.y = y
+
+    def pack(self, records, width, height, heuristic, rotation=False):
+        """Pack all the records in a bin of this ``width``.
+
+        Return the list of positions and the size of the used area.
+        """
+        # Shortest side of the records from every index to the end
+        smallest = [0] * len(records)
+        size = None
+        for i in range(len(records) - 1, -1, -1):
+            record = records[i]
+            size = min(size or record.absolute_width, record.absolute_width, record.absolute_height)
+            smallest[i] = size
+
+        container = MaxRectsBin(width, height, heuristic, max(width // 16, 16))
+        positions = []
+        used_width = used_height = 0
+        for i, record in enumerate(records):
+            if i and smallest[i] != smallest[i - 1]:
+                container.discard(smallest[i])
+
+            position = container.find(record.absolute_width, record.absolute_height, rotation)
+            while position is None:
+                container.grow(max(record.absolute_height, container.height // 4))
+                position = container.find(record.absolute_width, record.absolute_height, rotation)
+
+            w, h = record.absolute_width, record.absolute_height
+            if position[2]:
+                w, h = h, w
+
+            container.place(position[0], position[1], w, h)
+            positions.append(position)
+            used_width = max(used_width, position[0] + w)
+            used_height = max(used_height, position[1] + h)
+
+        return positions, (used_width, used_height)
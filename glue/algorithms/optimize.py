@@ -0,0 +1,93 @@
+import time
+import random
+
+from glue.helpers import next_power_of_two
+
+
+class LayoutOptimizer(object):
+    """Improve the layout of a sprite placed by a greedy algorithm.
+
+    Greedy algorithms place the images in order, so a different order can
+    lead to a smaller canvas. Starting from the order of the current layout,
+    every iteration swaps two images or moves one of them to another
+    position and places all of them again with the same algorithm. Changes
+    that don't make the canvas larger are kept.
+
+    Changes are chosen using a random generator initialized with ``seed``,
+    so the same images, settings and seed always lead to the same layout
+    unless ``budget`` seconds pass before all the iterations are done.
+    """
+
+    def __init__(self, iterations, budget=0, seed=0, pot=False, accept=None):
+        """Optimizer constructor.
+
+        :param iterations: Maximum number of layouts to try.
+        :param budget: Maximum number of seconds to spend, ``0`` means no
+                       limit.
+        :param seed: Seed of the random generator.
+        :param pot: Compare canvas sizes rounded up to the next power of two.
+        :param accept: Optional function returning whether a layout is valid.
+        """
+        self.iterations = iterations
+        self.budget = budget
+        self.seed = seed
+        self.pot = pot
+        self.accept = accept
+
+    def score(self, sprite):
+        width, height = sprite.size
+        if self.pot:
+            area = next_power_of_two(width) * next_power_of_two(height)
+        else:
+            area = width * height
+        return (area, width * height, max(width, height))
+
+    def process(self, sprite):
+        """Optimize the layout of ``sprite`` in place and return the
+        fraction of canvas area saved.
+
+        :param sprite: :class:`~glue.algorithms.layout.LayoutSprite` already
+                       placed using ``sprite.algorithm``.
+        """
+        from glue.algorithms import algorithms
+
+        algorithm = algorithms[sprite.algorithm]()
+        generator = random.Random(self.seed)
+        deadline = time.time() + self.budget if self.budget else None
+
+        records = sprite.layout
+        if len(records) < 2:
+            return 0.0
+
+        initial = current = self.score(sprite)
+        best = [(r.x, r.y, r.rotated) for r in records]
+
+        for iteration in range(self.iterations):
+            if deadline is not None and time.time() > deadline:
+                break
+
+            order = list(records)
+            i, j = generator.sample(range(len(order)), 2)
+            if generator.random() < 0.5:
+                order[i], order[j] = order[j], order[i]
+            else:
+                order.insert(j, order.pop(i))
+
+            sprite.layout = order
+            try:
+                algorithm.process(sprite)
+            except ValueError:
+                # Some algorithms can't place every order, like square
+                # when the first image isn't the largest one.
+                continue
+            score = self.score(sprite)
+            if score <= current and (self.accept is None or self.accept(sprite)):
+                records, current = order, score
+                best = [(r.x, r.y, r.rotated) for r in records]
+
+        sprite.layout = records
+        for record, (x, y, rotated) in zip(records, best):
+            record.rotate(rotated)
+            record.x, record.y = x, y
+
+        return 1 - current[0] / float(initial[0])
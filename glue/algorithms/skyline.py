@@ -0,0 +1,139 @@
+import math
+import heapq
+
+
+class SkylineSegment(object):
+
+    __slots__ = ('x', 'y', 'width', 'prev', 'next', 'alive')
+
+    def __init__(self, x, y, width, prev=None, next=None):
+        """Segment constructor.
+
+        :param x: X coordinate of the left end.
+        :param y: Height of the skyline along this segment.
+        :param width: Segment width.
+        :param prev: :class:`~SkylineSegment` on the left.
+        :param next: :class:`~SkylineSegment` on the right.
+        """
+        self.x = x
+        self.y = y
+        self.width = width
+        self.prev = prev
+        self.next = next
+        self.alive = True
+
+
+class SkylineAlgorithm(object):
+    """Skyline bottom-left packer.
+
+    The top profile of the images already placed is stored as a linked list
+    of horizontal segments, and a heap keeps them ordered by height. Every
+    image is placed on the left of the lowest segment. If the lowest
+    segment is too narrow, it is raised to the height of its lowest
+    neighbour and merged with it, wasting the space below. Every merge
+    removes a segment, so each image costs O(log n) amortized.
+    """
+
+    def process(self, sprite):
+        rotation = sprite.config['allow_rotation']
+        records = sprite.layout
+        for record in records:
+            record.rotate(False)
+
+        max_width = max([r.absolute_width for r in records])
+        area = sum([r.absolute_width * r.absolute_height for r in records])
+        width = max(max_width, int(math.ceil(math.sqrt(area))))
+
+        self.heap = []
+        self.push(SkylineSegment(0, 0, width))
+
+        for record in records:
+            w, h = record.absolute_width, record.absolute_height
+            segment = self.pop()
+            while segment.width < w and not (rotation and segment.width >= h):
+                segment = self.raise_segment(segment)
+
+            # Lying images down keeps the skyline lower
+            if rotation and h <= segment.width and (w > segment.width or w < h):
+                record.rotate()
+                w, h = h, w
+
+            record.x = segment.x
+            record.y = segment.y
+            self.place(segment, w, h)
+
+    def push(self, segment):
+        heapq.heappush(self.heap, (segment.y, segment.x, id(segment), segment))
+
+    def pop(self):
+        """Return the lowest (and leftmost) segment of the skyline."""
+        while True:
+            y, x, _, segment = heapq.heappop(self.heap)
+            if segment.alive and segment.y == y and segment.x == x:
+                return segment
+
+    def raise_segment(self, segment):
+        """Merge ``segment`` with its lowest neighbour and return the lowest
+        segment of the skyline after it.
+
+        :param segment: Segment too narrow for the current image.
+        """
+        prev, next = segment.prev, segment.next
+        if next is None or (prev is not None and prev.y <= next.y):
+            prev.width += segment.width
+            self.unlink(segment)
+            self.merge(prev)
+        else:
+            next.x = segment.x
+            next.width += segment.width
+            self.unlink(segment)
+            self.merge(next)
+            self.push(next)
+        return self.pop()
+
+    def place(self, segment, width, height):
+        """Allocate an image of this size on the left of ``segment``.
+
+        :param segment: Lowest segment of the skyline.
+        :param width: Image width.
+        :param height: Image height.
+        """
+        top = SkylineSegment(segment.x, segment.y + height, width, segment.prev, segment)
+        if segment.prev is not None:
+            segment.prev.next = top
+        segment.prev = top
+
+        if segment.width == width:
+            self.unlink(segment)
+        else:
+            segment.x += width
+            segment.width -= width
+            self.push(segment)
+
+        if not self.merge(top):
+            self.push(top)
+
+    def merge(self, segment):
+        """Merge ``segment`` with its neighbours if they have the same height.
+
+        Return ``True`` if ``segment`` has been merged into the segment on
+        its left.
+        """
+        next = segment.next
+        if next is not None and next.y == segment.y:
+            segment.width += next.width
+            self.unlink(next)
+
+        prev = segment.prev
+        if prev is not None and prev.y == segment.y:
+            prev.width += segment.width
+            self.unlink(segment)
+            return True
+        return False
+
+    def unlink(self, segment):
+        segment.alive = False
+        if segment.prev is not None:
+            segment.prev.next = segment.next
+        if segment.next is not None:
+            segment.next.prev = segment.prev
@@ -2,7 +2,7 @@ class VerticalAlgorithm(object):
 
     def process(self, sprite):
         y = 0
-        for image in sprite.images:
+        for image in sprite.layout:
             image.x = 0
             image.y = y
             y += image.absolute_height
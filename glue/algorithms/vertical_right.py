@@ -1,9 +1,9 @@
 class VerticalRightAlgorithm(object):
 
     def process(self, sprite):
-        max_width = max([i.width for i in sprite.images])
+        max_width = max([i.width for i in sprite.layout])
         y = 0
-        for image in sprite.images:
+        for image in sprite.layout:
             image.x = max_width - image.width
             image.y = y
             y += image.absolute_height
@@ -70,6 +70,15 @@ def main(argv=None):
                         default=os.environ.get('GLUE_PROJECT', False),
                         help="Generate sprites for multiple folders")
 
+    parser.add_argument("-j", "--jobs",
+                        dest="jobs",
+                        type=int,
+                        metavar='N',
+                        default=os.environ.get('GLUE_JOBS', 1),
+                        help=("Number of processes used to decode and crop "
+                              "the source images and threads used to save "
+                              "the sprite images (default: 1)"))
+
     parser.add_argument("-v", "--version",
                         action="version",
                         version='%(prog)s ' + __version__,
@@ -84,10 +93,55 @@ def main(argv=None):
                        default=os.environ.get('GLUE_ALGORITHM', 'square'),
                        choices=['square', 'vertical', 'horizontal',
                                 'vertical-right', 'horizontal-bottom',
-                                'diagonal'],
+                                'diagonal', 'maxrects', 'skyline', 'grid',
+                                'auto'],
                        help=("Allocation algorithm: square, vertical, "
                              "horizontal, vertical-right, horizontal-bottom, "
-                             "diagonal. (default: square)"))
+                             "diagonal, maxrects, skyline, grid, auto. "
+                             "(default: square)"))
+
+    group.add_argument("--maxrects-heuristic",
+                       dest="maxrects_heuristic",
+                       metavar='NAME',
+                       type=unicode,
+                       default=os.environ.get('GLUE_MAXRECTS_HEURISTIC', 'best-short-side'),
+                       choices=['best-short-side', 'best-long-side',
+                                'best-area', 'bottom-left'],
+                       help=("Placement heuristic of the maxrects algorithm: "
+                             "best-short-side, best-long-side, best-area or "
+                             "bottom-left (default: best-short-side)"))
+
+    group.add_argument("--auto-budget",
+                       dest="auto_budget",
+                       metavar='SECONDS',
+                       type=float,
+                       default=os.environ.get('GLUE_AUTO_BUDGET', 10),
+                       help=("Maximum time the auto algorithm spends trying "
+                             "algorithms and orderings (default: 10)"))
+
+    group.add_argument("--optimize",
+                       dest="optimize",
+                       metavar='ITERATIONS',
+                       type=int,
+                       default=os.environ.get('GLUE_OPTIMIZE', 0),
+                       help=("Try to make the sprite smaller placing the "
+                             "images again in other orders this number of "
+                             "times (default: 0)"))
+
+    group.add_argument("--optimize-budget",
+                       dest="optimize_budget",
+                       metavar='SECONDS',
+                       type=float,
+                       default=os.environ.get('GLUE_OPTIMIZE_BUDGET', 0),
+                       help=("Maximum time spent optimizing every sprite, 0 "
+                             "means no limit (default: 0)"))
+
+    group.add_argument("--optimize-seed",
+                       dest="optimize_seed",
+                       metavar='SEED',
+                       type=int,
+                       default=os.environ.get('GLUE_OPTIMIZE_SEED', 0),
+                       help="Seed used to optimize the sprites (default: 0)")
 
     group.add_argument("--ordering",
                        dest="algorithm_ordering",
@@ -99,6 +153,51 @@ def main(argv=None):
                        help=("Ordering criteria: maxside, width, height, area or "
                              "filename (default: maxside)"))
 
+    group.add_argument("--max-size",
+                       dest="max_size",
+                       metavar='PX',
+                       type=int,
+                       default=os.environ.get('GLUE_MAX_SIZE', 0),
+                       help=("Maximum width and height of the sprite. Images "
+                             "that don't fit are placed in additional pages "
+                             "(default: unlimited)"))
+
+    group.add_argument("--pot",
+                       dest="pot",
+                       action="store_true",
+                       default=os.environ.get('GLUE_POT', False),
+                       help="Use power of two sizes for the sprite")
+
+    group.add_argument("--allow-rotation",
+                       dest="allow_rotation",
+                       action="store_true",
+                       default=os.environ.get('GLUE_ALLOW_ROTATION', False),
+                       help=("Allow the maxrects and skyline algorithms to "
+                             "rotate images 90 degrees"))
+
+    group.add_argument("--incremental",
+                       dest="incremental",
+                       action="store_true",
+                       default=os.environ.get('GLUE_INCREMENTAL', False),
+                       help=("Keep images in the same position they had on "
+                             "the previous build"))
+
+    group.add_argument("--repack-threshold",
+                       dest="repack_threshold",
+                       metavar='RATIO',
+                       type=float,
+                       default=os.environ.get('GLUE_REPACK_THRESHOLD', 0.3),
+                       help=("Growth of the fraction of wasted space that "
+                             "forces an incremental sprite to be placed "
+                             "again (default: 0.3)"))
+
+    group.add_argument("--dedup",
+                       dest="dedup",
+                       action="store_true",
+                       default=os.environ.get('GLUE_DEDUP', False),
+                       help=("Place identical images only once inside the "
+                             "sprite"))
+
     # Populate the parser with options required by other formats
     for format in formats.itervalues():
         format.populate_argument_parser(parser)
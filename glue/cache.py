@@ -0,0 +1,295 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from PIL import Image as PILImage
+
+from glue.helpers import write_json, canonical_json
+
+
+CACHE_DIRNAME = '.glue-cache'
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Return the sha1 hex digest of the file at ``path`` reading it in
+    chunks.
+
+    :param path: File path.
+    :param chunk_size: Bytes read on every iteration.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FingerprintCache(object):
+    """Persistent map of source files to the digest of their content.
+
+    Every entry is stored with the size, modification time and inode of the
+    file, so unchanged files only need to be stat'ed in order to know their
+    digest. There is only one instance per cache directory, which can be
+    used from several threads.
+    """
+
+    filename = 'fingerprints.json'
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        self.lock = threading.Lock()
+        try:
+            with open(os.path.join(self.path, self.filename)) as f:
+                self.entries = json.load(f)
+        except (IOError, ValueError):
+            self.entries = {}
+
+    @classmethod
+    def get(cls, path):
+        """Return the cache stored in the ``path`` directory."""
+        path = os.path.abspath(path)
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path)
+            return cls._instances[path]
+
+    def fingerprint(self, path):
+        """Return the size, modification time and inode of ``path``."""
+        stat = os.stat(path)
+        return [stat.st_size, repr(stat.st_mtime), stat.st_ino]
+
+    def digests(self, paths):
+        """Return a dictionary with the digest of every file in ``paths``.
+
+        Only files which are not in the cache or have changed are read. Their
+        digests are calculated in parallel using a pool of threads.
+
+        :param paths: List of file paths.
+        """
+        digests, stale = {}, []
+        for path in paths:
+            key = os.path.abspath(path)
+            fingerprint = self.fingerprint(key)
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry and entry[:3] == fingerprint:
+                digests[path] = entry[3]
+            else:
+                stale.append((path, key, fingerprint))
+
+        threads = min(len(stale), multiprocessing.cpu_count())
+        if threads > 1:
+            pool = ThreadPool(threads)
+            try:
+                stale_digests = pool.map(file_digest, [key for path, key, fingerprint in stale])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            stale_digests = [file_digest(key) for path, key, fingerprint in stale]
+
+        with self.lock:
+            for (path, key, fingerprint), digest in zip(stale, stale_digests):
+                self.entries[key] = fingerprint + [digest]
+                digests[path] = digest
+                self.dirty = True
+
+        return digests
+
+    def save(self):
+        """Write the cache to disk if there is any new entry."""
+        with self.lock:
+            if self.dirty:
+                write_json(os.path.join(self.path, self.filename), self.entries)
+                self.dirty = False
+
+
+class ImageCache(object):
+    """On-disk cache of decoded (and cropped if required) source images.
+
+    Entries are addressed by the digest of the source image and the
+    settings that change how it is decoded. Every entry stores the original
+    size, the crop box and the raw RGBA pixels, which are read back
+    without decoding the image again. The least recently used entries
+    are removed once the cache grows beyond ``max_size`` bytes.
+    """
+
+    dirname = 'images'
+    extension = '.rgba'
+    header = struct.Struct('<6I')
+
+    # Bump this version if the way images are decoded changes.
+    version = 1
+
+    _instances = {}
+
+    def __init__(self, path, max_size):
+        self.path = os.path.join(path, self.dirname)
+        self.max_size = max_size
+        self.size = None
+
+    @classmethod
+    def get(cls, path, max_size):
+        """Return the cache stored in the ``path`` directory."""
+        path = os.path.abspath(path)
+        if path not in cls._instances:
+            cls._instances[path] = cls(path, max_size)
+        cls._instances[path].max_size = max_size
+        return cls._instances[path]
+
+    def entry_path(self, digest, crop):
+        key = hashlib.sha1(canonical_json([self.version, digest, bool(crop)])).hexdigest()
+        return os.path.join(self.path, key + self.extension)
+
+    def load(self, digest, crop):
+        """Return the original size, the crop box and the RGBA image for the
+        source image with this ``digest`` or ``None`` if it isn't cached.
+
+        The entry is memory-mapped only while its pixels are copied, so
+        loaded images don't keep any file open.
+
+        :param digest: Digest of the source image.
+        :param crop: Crop flag of the image.
+        """
+        path = self.entry_path(digest, crop)
+        try:
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, ValueError):
+            return None
+
+        try:
+            if len(data) < self.header.size:
+                return None
+            values = self.header.unpack(data[:self.header.size])
+            original_size, bbox = values[:2], values[2:]
+            size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+            if len(data) != self.header.size + size[0] * size[1] * 4:
+                return None
+            image = PILImage.frombytes('RGBA', size, data[self.header.size:])
+        finally:
+            data.close()
+
+        # Keep track of the last time this entry was used
+        os.utime(path, None)
+
+        return original_size, bbox, image
+
+    def store(self, digest, crop, original_size, bbox, pixels):
+        """Add a decoded image to the cache.
+
+        :param digest: Digest of the source image.
+        :param crop: Crop flag of the image.
+        :param original_size: Size of the source image.
+        :param bbox: Crop box of the image.
+        :param pixels: Raw RGBA pixels of the cropped image.
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        path = self.entry_path(digest, crop)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(self.header.pack(*(tuple(original_size) + tuple(bbox))))
+            f.write(pixels)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(path + '.tmp', path)
+
+        if self.size is None:
+            self.size = sum([size for mtime, size, entry in self._entries()])
+        else:
+            self.size += self.header.size + len(pixels)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        """Return the modification time, size and path of every entry."""
+        entries = []
+        for filename in os.listdir(self.path):
+            if filename.endswith(self.extension):
+                path = os.path.join(self.path, filename)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is smaller
+        than ``max_size``."""
+        entries = sorted(self._entries())
+        self.size = sum([size for mtime, size, path in entries])
+        for mtime, size, path in entries:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                self.size -= size
+            except OSError:
+                # Entries in use can't be removed on some platforms.
+                pass
+
+
+class LayoutCache(object):
+    """Layout of every sprite on the previous build, used to keep images
+    where they were when the sprite is built again incrementally.
+
+    Every sprite entry stores the settings it was built with, so layouts
+    built with different settings are never reused.
+    """
+
+    dirname = 'layouts'
+
+    # Bump this version if the way layouts are stored changes.
+    version = 2
+
+    def __init__(self, path):
+        self.path = os.path.join(path, self.dirname)
+
+    def entry_path(self, name):
+        return os.path.join(self.path, name + '.json')
+
+    def load(self, name, settings):
+        """Return the previous layout of the sprite with this ``name`` or
+        ``None`` if there is none or it was built using other settings.
+
+        :param name: Sprite name.
+        :param settings: Digest of the sprite settings.
+        """
+        try:
+            with open(self.entry_path(name)) as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        if entry.get('version') != self.version or entry.get('settings') != settings:
+            return None
+        return entry
+
+    def store(self, name, settings, algorithm, ordering, size, images, packed_waste):
+        """Save the layout of the sprite with this ``name``.
+
+        :param name: Sprite name.
+        :param settings: Digest of the sprite settings.
+        :param algorithm: Algorithm used to place the images.
+        :param ordering: Ordering used to place the images.
+        :param size: Size of the used area of the canvas.
+        :param images: Dictionary with the position, unrotated size and
+                       rotation of every image.
+        :param packed_waste: Fraction of the canvas wasted by the last
+                             layout placing every image.
+        """
+        write_json(self.entry_path(name), {'version': self.version,
+                                           'settings': settings,
+                                           'algorithm': algorithm,
+                                           'ordering': ordering,
+                                           'size': list(size),
+                                           'images': images,
+                                           'packed_waste': packed_waste})
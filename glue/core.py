@@ -1,100 +1,230 @@
 import re
 import os
 import sys
-import copy
 import hashlib
 import StringIO
 import ConfigParser
+import multiprocessing
 
 from PIL import Image as PILImage
 
 from glue.algorithms import algorithms
-from glue.helpers import cached_property, round_up
+from glue.algorithms.layout import LayoutSprite, sort_layout
+from glue.algorithms.maxrects import MaxRectsBin
+from glue.algorithms.optimize import LayoutOptimizer
+from glue.helpers import (cached_property, round_up, canonical_json, LayeredConfig,
+                          next_power_of_two)
 from glue.formats import ImageFormat
-from glue.exceptions import SourceImagesNotFoundError, PILUnavailableError
+from glue.cache import FingerprintCache, ImageCache, LayoutCache, CACHE_DIRNAME
+from glue.exceptions import SourceImagesNotFoundError, PILUnavailableError, ValidationError
+
+
+def decode_image(data):
+    """Return a RGBA PIL representation of the encoded image ``data``.
+
+    :param data: Raw content of a png, jpg or gif file.
+    """
+    io = StringIO.StringIO(data)
+    try:
+        source_image = PILImage.open(io)
+        img = PILImage.new('RGBA', source_image.size, (0, 0, 0, 0))
+
+        if source_image.mode == 'L':
+            alpha = source_image.split()[0]
+            transparency = source_image.info.get('transparency')
+            mask = PILImage.eval(alpha, lambda a: 0 if a == transparency else 255)
+            img.paste(source_image, (0, 0), mask=mask)
+        else:
+            img.paste(source_image, (0, 0))
+    except IOError, e:
+        raise PILUnavailableError(e.args[0].split()[1])
+    finally:
+        io.close()
+    return img
+
+
+def crop_box(img):
+    """Return the smallest possible bounding box of ``img`` without losing
+    any non-transparent pixel."""
+    return img.split()[-1].getbbox() or (0, 0) + img.size
+
+
+def decode_worker(args):
+    """Decode (and crop if required) one image inside a worker process.
+
+    Return the original size, the crop box and the raw RGBA pixels of the
+    cropped image, which are cheaper to send back than a PIL image.
+
+    :param args: Tuple of the image data and the crop flag.
+    """
+    data, crop = args
+    img = decode_image(data)
+    if crop:
+        bbox = crop_box(img)
+        return img.size, bbox, img.crop(bbox).tobytes()
+    return img.size, (0, 0) + img.size, img.tobytes()
 
 
 class ConfigurableFromFile(object):
 
+    # Parsed configuration files by path. Every entry stores the stat
+    # signature of the file and its sections so each file is only parsed
+    # once per run unless it changes.
+    _config_files = {}
+
     def _get_config_from_file(self, filename, section):
         """Return, as a dictionary, all the available configuration inside the
         sprite configuration file on this sprite path."""
+        sections = self._read_config_file(os.path.join(self.config_path, filename))
+        return dict(sections.get(section, {}))
+
+    @classmethod
+    def _read_config_file(cls, path):
+        """Return a dictionary with all the sections of the configuration
+        file at ``path``. Parsed files are cached using their path, size and
+        modification time."""
 
         def clean(value):
             return {'true': True, 'false': False}.get(value.lower(), value)
 
-        config = ConfigParser.RawConfigParser()
-        config.read(os.path.join(self.config_path, filename))
         try:
-            keys = config.options(section)
-        except ConfigParser.NoSectionError:
-            return {}
-        return dict([[k, clean(config.get(section, k))] for k in keys])
+            stat = os.stat(path)
+            signature = (stat.st_mtime, stat.st_size)
+        except OSError:
+            signature = None
+
+        cached = cls._config_files.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        sections = {}
+        if signature:
+            config = ConfigParser.RawConfigParser()
+            config.read(path)
+            for section in config.sections():
+                keys = config.options(section)
+                sections[section] = dict([[k, clean(config.get(section, k))] for k in keys])
+
+        cls._config_files[path] = (signature, sections)
+        return sections
 
 
 class Image(ConfigurableFromFile):
 
-    def __init__(self, path, config):
+    def __init__(self, path, config, cache=None):
         self.path = path
+        self.cache = cache
+        self.duplicate_of = None
+        self.page = 0
+        self.rotated = False
         self.filename = os.path.basename(path)
         self.dirname = self.config_path = os.path.dirname(path)
 
-        self.config = copy.deepcopy(config)
-        self.config.update(self._get_config_from_file('sprite.conf', self.filename))
+        self.config = LayeredConfig(config, self._get_config_from_file('sprite.conf', self.filename))
 
         self.x = self.y = None
-        self.original_width = self.original_height = 0
 
+        print "\t{0} added to sprite".format(self.filename)
+
+    @cached_property
+    def _image_data(self):
+        """Return the content of the source file. It is only read once
+        the image needs to be decoded or hashed."""
         with open(self.path, "rb") as img:
-            self._image_data = img.read()
+            return img.read()
 
-        print "\t{0} added to sprite".format(self.filename)
+    @cached_property
+    def digest(self):
+        """Return the sha1 hex digest of the source image data."""
+        return hashlib.sha1(self._image_data).hexdigest()
 
     @cached_property
-    def image(self):
-        """Return a Pil representation of this image """
-        io = StringIO.StringIO(self._image_data)
-        try:
-            source_image = PILImage.open(io)
-            img = PILImage.new('RGBA', source_image.size, (0, 0, 0, 0))
-
-            if source_image.mode == 'L':
-                alpha = source_image.split()[0]
-                transparency = source_image.info.get('transparency')
-                mask = PILImage.eval(alpha, lambda a: 0 if a == transparency else 255)
-                img.paste(source_image, (0, 0), mask=mask)
-            else:
-                img.paste(source_image, (0, 0))
-        except IOError, e:
-            raise PILUnavailableError(e.args[0].split()[1])
-        finally:
-            io.close()
+    def original_size(self):
+        """Return the size of the source image reading only its header."""
+        with open(self.path, "rb") as img:
+            try:
+                return PILImage.open(img).size
+            except IOError, e:
+                raise PILUnavailableError(e.args[0].split()[1])
+
+    @property
+    def original_width(self):
+        return self.original_size[0]
 
-        self.original_width, self.original_height = img.size
+    @property
+    def original_height(self):
+        return self.original_size[1]
 
-        # Crop the image searching for the smallest possible bounding box
-        # without losing any non-transparent pixel.
-        # This crop is only used if the crop flag is set in the config.
+    @cached_property
+    def bbox(self):
+        """Return the box of the source image that will be placed on the
+        canvas.
+
+        If the crop flag is set in the config, this is the smallest possible
+        bounding box without losing any non-transparent pixel. Finding it
+        requires decoding the image, which is kept so it is only decoded
+        once."""
+        if self.duplicate_of is not None:
+            return self.duplicate_of.bbox
         if self.config['crop']:
-            img = img.crop(img.split()[-1].getbbox())
-        return img
+            return self.decoded[1]
+        return (0, 0) + self.original_size
+
+    @cached_property
+    def image(self):
+        """Return a Pil representation of this image. The source is only
+        fully decoded once its pixels are needed."""
+        if self.duplicate_of is not None:
+            return self.duplicate_of.image
+        return self.decoded[2]
+
+    @cached_property
+    def decoded(self):
+        """Return the original size, the crop box and the (cropped if
+        required) RGBA representation of this image.
+
+        If there is a decoded images cache, the image is loaded from it or
+        stored into it after decoding."""
+        crop = self.config['crop']
+        if self.cache is not None:
+            cached = self.cache.load(self.digest, crop)
+            if cached:
+                return cached
+
+        img = decode_image(self._image_data)
+        original_size = img.size
+        if crop:
+            bbox = crop_box(img)
+            img = img.crop(bbox)
+        else:
+            bbox = (0, 0) + img.size
+
+        if self.cache is not None:
+            self.cache.store(self.digest, crop, original_size, bbox, img.tobytes())
+        return original_size, bbox, img
+
+    def load(self, original_size, bbox, image):
+        """Populate this image using an already decoded (and cropped if
+        required) RGBA image instead of decoding it again."""
+        self.original_size = original_size
+        self.decoded = (original_size, bbox, image)
 
     @property
     def width(self):
         """Return Image width"""
-        return self.image.size[0]
+        return self.bbox[2] - self.bbox[0]
 
     @property
     def height(self):
         """Return Image height"""
-        return self.image.size[1]
+        return self.bbox[3] - self.bbox[1]
 
-    @property
+    @cached_property
     def padding(self):
         """Return a 4-elements list with the desired padding."""
         return self._generate_spacing_info(self.config['padding'])
 
-    @property
+    @cached_property
     def margin(self):
         """Return a 4-elements list with the desired marging."""
         return self._generate_spacing_info(self.config['margin'])
@@ -165,10 +295,16 @@ class Sprite(ConfigurableFromFile):
     config_section = 'sprite'
     valid_extensions = ['png', 'jpg', 'jpeg', 'gif']
 
+    # Settings that change the sprite image. Format specific settings are
+    # part of each format hash instead.
+    hash_settings = ['algorithm', 'algorithm_ordering', 'crop', 'padding',
+                     'margin', 'ratios', 'png8', 'dedup', 'maxrects_heuristic',
+                     'auto_budget', 'max_size', 'pot', 'allow_rotation',
+                     'optimize', 'optimize_budget', 'optimize_seed']
+
     def __init__(self, path, config, name=None):
         self.path = self.config_path = path
-        self.config = copy.deepcopy(config)
-        self.config.update(self._get_config_from_file('sprite.conf', 'sprite'))
+        self.config = LayeredConfig(config, self._get_config_from_file('sprite.conf', 'sprite'))
         self.name = name or self.config.get('name', os.path.basename(path))
 
         # Setup ratios
@@ -185,6 +321,8 @@ class Sprite(ConfigurableFromFile):
 
         # Discover images inside this sprite
         self.images = self._locate_images()
+        self.processed = False
+        self.pages = None
 
         img_format = ImageFormat(sprite=self)
         for ratio in ratios:
@@ -194,13 +332,237 @@ class Sprite(ConfigurableFromFile):
 
         print "Processing '{0}':".format(self.name)
 
-        # Generate sprite map
-        self.process()
-
     def process(self):
-        algorithm_cls = algorithms[self.config['algorithm']]
-        algorithm = algorithm_cls()
-        algorithm.process(self)
+        """Generate the sprite map: order the images using the desired
+        ordering and place them using the desired algorithm.
+
+        This is the first step that needs to know the size of the images, so
+        it is deferred until some format needs to be rebuilt.
+        """
+        if self.processed:
+            return
+
+        if self.config['dedup']:
+            self._find_duplicates()
+
+        if int(self.config['jobs']) > 1:
+            self._decode_images([i for i in self.images if i.duplicate_of is None])
+
+        records = sort_layout(self.images, self.config['algorithm_ordering'])
+        self.images = [record.image for record in records]
+
+        # Only unique images are placed on the canvas, duplicates share
+        # the position of the first image with the same content.
+        self.layout = [record for record in records if record.image.duplicate_of is None]
+
+        if int(self.config['max_size']):
+            pages = self._paginate(self.layout)
+        elif self.config['incremental']:
+            pages = [self._pack_incremental(self.layout)]
+        else:
+            pages = [self._pack(self.layout)]
+
+        if int(self.config['optimize']) and not self.config['incremental']:
+            for page in pages:
+                self._optimize(page)
+
+        for index, page in enumerate(pages):
+            for record in page.layout:
+                record.apply()
+                record.image.page = index
+
+        for image in self.images:
+            if image.duplicate_of is not None:
+                image.x, image.y = image.duplicate_of.x, image.duplicate_of.y
+                image.page = image.duplicate_of.page
+                image.rotated = image.duplicate_of.rotated
+
+        # Algorithms like auto can choose a different algorithm or ordering.
+        self.algorithm = pages[0].algorithm
+        self.algorithm_ordering = pages[0].algorithm_ordering
+
+        if len(pages) > 1:
+            self.pages = [SpritePage(self, index, page) for index, page in enumerate(pages)]
+        else:
+            self.pages = [self]
+            if self.config['incremental']:
+                self._save_layout(pages[0])
+
+        self.processed = True
+
+    def get_pages(self, count=None):
+        """Return the sprites formats need to build: this sprite or one
+        :class:`~SpritePage` for every page.
+
+        :param count: Number of pages to use if this sprite isn't processed.
+        """
+        if self.pages is not None:
+            return self.pages
+        if count > 1:
+            return [SpritePage(self, index) for index in range(count)]
+        return [self]
+
+    def _pack(self, records):
+        """Place ``records`` using the configured algorithm and return them
+        as a :class:`~LayoutSprite`. Records always start unrotated, as
+        previous attempts may have rotated them.
+
+        The wasted space of the result is kept, so later incremental builds
+        can know how much it grows."""
+        for record in records:
+            record.rotate(False)
+        page = LayoutSprite(records, self.config)
+        algorithms[self.config['algorithm']]().process(page)
+        page.packed_waste = self._waste(page)
+        return page
+
+    @property
+    def layout_cache(self):
+        return LayoutCache(os.path.join(self.config['img_dir'], CACHE_DIRNAME))
+
+    @property
+    def layout_settings(self):
+        """Return a digest of the settings previous layouts must have been
+        built with in order to be reused."""
+        settings = canonical_json(self.hash_config(self.hash_settings))
+        return hashlib.sha1(settings).hexdigest()
+
+    def _pack_incremental(self, records):
+        """Place ``records`` keeping every image in the same position it
+        had on the previous build and return them as a
+        :class:`~LayoutSprite`.
+
+        Only new or resized images are placed, using the free space left by
+        the others. If there is no previous layout, or the wasted fraction
+        of the canvas grows more than ``repack_threshold`` over the one of
+        the last layout placing every image, all the images are placed
+        again using the configured algorithm.
+        """
+        previous = self.layout_cache.load(self.name, self.layout_settings)
+        if previous is None:
+            return self._pack(records)
+
+        kept, pending = [], []
+        for record in records:
+            record.rotate(False)
+            position = previous['images'].get(self.relpath(record.image.path))
+            if position and position[2:4] == [record.absolute_width, record.absolute_height]:
+                record.rotate(position[4])
+                record.x, record.y = position[:2]
+                kept.append(record)
+            else:
+                pending.append(record)
+
+        width, height = previous['size']
+        rotation = self.config['allow_rotation']
+        for record in pending:
+            if record.absolute_width > width and (not rotation or record.absolute_height > width):
+                print "\tLayout placed again: {0} is wider than the sprite".format(record.image.filename)
+                return self._pack(records)
+
+        # Bottom-left placement makes the canvas grow as little as possible
+        container = MaxRectsBin(width, height, 'bottom-left')
+        for record in kept:
+            container.place(record.x, record.y, record.absolute_width, record.absolute_height)
+
+        for record in pending:
+            position = container.find(record.absolute_width, record.absolute_height, rotation)
+            while position is None:
+                container.grow(max(record.absolute_height, container.height // 4))
+                position = container.find(record.absolute_width, record.absolute_height, rotation)
+
+            record.rotate(position[2])
+            record.x, record.y = position[:2]
+            container.place(record.x, record.y, record.absolute_width, record.absolute_height)
+
+        page = LayoutSprite(records, self.config)
+        page.algorithm = previous['algorithm']
+        page.algorithm_ordering = previous['ordering']
+        page.packed_waste = previous['packed_waste']
+
+        waste = self._waste(page)
+        if waste - page.packed_waste > float(self.config['repack_threshold']):
+            print "\tLayout placed again: wasted space grew from {0:.1%} to {1:.1%}".format(
+                page.packed_waste, waste)
+            return self._pack(records)
+        return page
+
+    def _waste(self, page):
+        """Return the fraction of the canvas of ``page`` not used by any
+        image."""
+        width, height = page.size
+        area = sum([r.absolute_width * r.absolute_height for r in page.layout])
+        return 1 - area / float(width * height)
+
+    def _save_layout(self, page):
+        """Store the layout of ``page`` so the next incremental build can
+        reuse it."""
+        images = {}
+        for record in page.layout:
+            width, height = record.absolute_width, record.absolute_height
+            if record.rotated:
+                width, height = height, width
+            images[self.relpath(record.image.path)] = [record.x, record.y, width,
+                                                       height, record.rotated]
+        self.layout_cache.store(self.name, self.layout_settings, page.algorithm,
+                                page.algorithm_ordering, page.size, images,
+                                page.packed_waste)
+
+    def _optimize(self, page):
+        """Improve the layout of ``page`` using a
+        :class:`~glue.algorithms.optimize.LayoutOptimizer` and report the
+        area saved."""
+        optimizer = LayoutOptimizer(int(self.config['optimize']),
+                                    float(self.config['optimize_budget']),
+                                    int(self.config['optimize_seed']),
+                                    pot=self.config['pot'],
+                                    accept=self._fits if int(self.config['max_size']) else None)
+        width, height = page.size
+        gain = optimizer.process(page)
+        print "\tLayout optimized: {0}x{1} -> {2}x{3} ({4:.1%} smaller)".format(
+            width, height, page.size[0], page.size[1], gain)
+
+    def _fits(self, page):
+        """Return ``True`` if ``page`` is not larger than ``max_size``."""
+        max_size = int(self.config['max_size'])
+        width, height = page.size
+        if self.config['pot']:
+            width, height = next_power_of_two(width), next_power_of_two(height)
+        return width <= max_size and height <= max_size
+
+    def _paginate(self, records):
+        """Split ``records`` in as many pages as needed to keep every page
+        smaller than ``max_size`` and return them.
+
+        Every page gets the longest run of the remaining records that fits
+        on it, found using a binary search.
+        """
+        pages = []
+        while records:
+            page = self._pack(records)
+            if self._fits(page):
+                pages.append(page)
+                break
+
+            low, high = 1, len(records) - 1
+            while low <= high:
+                middle = (low + high) // 2
+                if self._fits(self._pack(records[:middle])):
+                    low = middle + 1
+                else:
+                    high = middle - 1
+
+            if not high:
+                record = records[0]
+                raise ValidationError(("Error: {0} ({1}x{2}) doesn't fit in the "
+                                       "maximum sprite size ({3}px).").format(
+                                           record.image.path, record.absolute_width,
+                                           record.absolute_height, self.config['max_size']))
+
+            # Place the records again as other attempts moved them
+            pages.append(self._pack(records[:high]))
+            records = records[high:]
+        return pages
 
     def validate(self):
         pass
@@ -208,31 +570,71 @@ class Sprite(ConfigurableFromFile):
     @cached_property
     def hash(self):
         """ Return a hash of this sprite. In order to detect any change on
-        the source images  it use the data, order and path of each image.
-        In the same way it use this sprite settings as part of the hash.
+        the source images  it use the data and path of each image.
+        In the same way it use the sprite and image settings that change
+        the sprite image (``hash_settings``) as part of the hash.
+
+        The hash is fed incrementally using the digest of each image, so
+        the image data is never concatenated. Images are hashed in path
+        order as the layout only depends on these inputs, this way the hash
+        is available before the sprite is processed.
+
+        Paths and settings are hashed in a canonical way, so the same inputs
+        always generate the same hash, no matter the working directory or
+        the interpreter.
         """
-        hash_list = []
-        for image in self.images:
-            hash_list.append(os.path.relpath(image.path))
-            hash_list.append(image._image_data)
+        if self.config['cache']:
+            self._load_digests()
+
+        sprite_hash = hashlib.sha1()
+        for image in sorted(self.images, key=lambda i: i.path):
+            image_config = self.hash_config(self.hash_settings, image.config.overrides)
+            sprite_hash.update(canonical_json([self.relpath(image.path), image_config]))
+            sprite_hash.update(image.digest)
+
+        sprite_hash.update(canonical_json(self.hash_config(self.hash_settings)))
 
-        for key, value in self.config.iteritems():
-            hash_list.append(key)
-            hash_list.append(value)
+        return sprite_hash.hexdigest()[:10]
 
-        return hashlib.sha1(''.join(map(str, hash_list))).hexdigest()[:10]
+    def relpath(self, path):
+        """Return ``path`` relative to this sprite source using ``/`` as
+        separator on every platform."""
+        return os.path.relpath(path, self.path).replace(os.sep, '/')
+
+    def hash_config(self, keys, config=None):
+        """Return the ``keys`` settings of ``config`` (by default this sprite
+        config) ready to be hashed. Directories are made relative to this
+        sprite source, so the hash doesn't depend on the working directory.
+        Missing keys are ignored.
+        """
+        config = self.config if config is None else config
+        result = {}
+        for key in keys:
+            if key not in config:
+                continue
+            value = config[key]
+            if key.endswith('_dir') and isinstance(value, basestring):
+                value = self.relpath(os.path.abspath(value))
+            result[key] = value
+        return result
 
     @cached_property
     def canvas_size(self):
         """Return the width and height for this sprite canvas"""
         width = height = 0
         for image in self.images:
-            x = image.x + image.absolute_width
-            y = image.y + image.absolute_height
+            if image.rotated:
+                x = image.x + image.absolute_height
+                y = image.y + image.absolute_width
+            else:
+                x = image.x + image.absolute_width
+                y = image.y + image.absolute_height
             if width < x:
                 width = x
             if height < y:
                 height = y
+        if self.config['pot']:
+            return next_power_of_two(round_up(width)), next_power_of_two(round_up(height))
         return round_up(width), round_up(height)
 
     def sprite_path(self, ratio=1.0):
@@ -248,23 +650,124 @@ class Sprite(ConfigurableFromFile):
         :class:`~SourceImagesNotFoundError`
 
         The list of images will be ordered using the desired ordering
-        algorithm. The default is 'maxside'.
+        algorithm (the default is 'maxside') once the sprite is processed.
         """
         extensions = '|'.join(self.valid_extensions)
         extension_re = re.compile('.+\.(%s)$' % extensions, re.IGNORECASE)
         files = sorted(os.listdir(self.path))
 
+        cache = None
+        if self.config['cache']:
+            cache = ImageCache.get(os.path.join(self.config['img_dir'], CACHE_DIRNAME),
+                                   int(self.config['cache_size']) * 1024 * 1024)
+
         images = []
         for root, dirs, files in os.walk(self.path, followlinks=self.config['follow_links']):
             for filename in sorted(files):
                 if not filename.startswith('.') and extension_re.match(filename):
-                    images.append(Image(path=os.path.join(root, filename), config=self.config))
+                    images.append(Image(path=os.path.join(root, filename), config=self.config, cache=cache))
             if not self.config['recursive']:
                 break
 
         if not images:
             raise SourceImagesNotFoundError(self.path)
 
-        images = sorted(images, reverse=self.config['algorithm_ordering'][0] != '-')
-
         return images
+
+    def _find_duplicates(self):
+        """Mark every image with the same content and the same layout
+        settings as a previous image as a duplicate of it."""
+        unique = {}
+        for image in self.images:
+            key = (image.digest, canonical_json(self.hash_config(self.hash_settings, image.config)))
+            if key in unique:
+                image.duplicate_of = unique[key]
+            else:
+                unique[key] = image
+
+    def _decode_images(self, images):
+        """Decode and crop all the images using a pool of worker processes.
+
+        The result is exactly the same as decoding them one by one, so this
+        only changes where the work is done. Images already in the decoded
+        images cache are loaded from it instead.
+        """
+        pending = []
+        for image in images:
+            cached = image.cache.load(image.digest, image.config['crop']) if image.cache is not None else None
+            if cached:
+                image.load(*cached)
+            else:
+                pending.append(image)
+
+        if not pending:
+            return
+
+        pool = multiprocessing.Pool(int(self.config['jobs']))
+        try:
+            tasks = [(image._image_data, image.config['crop']) for image in pending]
+            results = pool.map(decode_worker, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+        for image, (original_size, bbox, pixels) in zip(pending, results):
+            if image.cache is not None:
+                image.cache.store(image.digest, image.config['crop'], original_size, bbox, pixels)
+            size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+            image.load(original_size, bbox, PILImage.frombytes('RGBA', size, pixels))
+
+    def _load_digests(self):
+        """Populate the digest of all the images using the fingerprint
+        cache, so unchanged source files don't need to be read."""
+        cache = FingerprintCache.get(os.path.join(self.config['img_dir'], CACHE_DIRNAME))
+        digests = cache.digests([image.path for image in self.images])
+        for image in self.images:
+            image.digest = digests[image.path]
+        cache.save()
+
+
+class SpritePage(object):
+    """One page of a sprite split in several pages using ``max_size``.
+
+    It has the same interface formats use from a :class:`~Sprite`, so every
+    page is built as an independent sprite named ``<sprite>-<page>``.
+    """
+
+    def __init__(self, sprite, index, layout=None):
+        """Page constructor.
+
+        :param sprite: :class:`~Sprite` of this page.
+        :param index: Page number.
+        :param layout: :class:`~glue.algorithms.layout.LayoutSprite` with
+                       the images of this page.
+        """
+        self.sprite = sprite
+        self.index = index
+        self.name = '{0}-{1}'.format(sprite.name, index)
+        self.config = sprite.config
+        self.ratios = sprite.ratios
+        self.max_ratio = sprite.max_ratio
+        self.processed = True
+
+        if layout is not None:
+            self.layout = layout.layout
+            self.algorithm = layout.algorithm
+            self.algorithm_ordering = layout.algorithm_ordering
+            self.images = [i for i in sprite.images if i.page == index]
+
+    @property
+    def hash(self):
+        return self.sprite.hash
+
+    @property
+    def pages(self):
+        return self.sprite.pages
+
+    def hash_config(self, *args, **kwargs):
+        return self.sprite.hash_config(*args, **kwargs)
+
+    canvas_size = Sprite.canvas_size
+
+    def sprite_path(self, ratio=1.0):
+        return ImageFormat(sprite=self).output_path(ratio)
@@ -1,12 +1,16 @@
 import os
 import json
 import codecs
+import hashlib
 import plistlib
 import textwrap
+import functools
 
 from jinja2 import Template
 
-from glue.helpers import round_up, nearest_fration
+from glue.cache import file_digest
+from glue.exceptions import ValidationError
+from glue.helpers import round_up, nearest_fration, cached_property, canonical_json, makedirs
 from glue import __version__
 
 
@@ -15,6 +19,19 @@ class BaseFormat(object):
     extension = None
     build_per_ratio = False
 
+    # Formats able to build every page of a sprite split using max_size.
+    multipage = False
+
+    # Formats able to describe images rotated using allow_rotation.
+    rotation = False
+
+    # Formats whose files can be saved at the same time by several threads.
+    threadsafe = False
+
+    # Settings that change the output of this format besides the sprite
+    # image and its layout.
+    hash_settings = []
+
     def __init__(self, sprite):
         self.sprite = sprite
 
@@ -34,12 +51,66 @@ class BaseFormat(object):
     def output_path(self, *args, **kwargs):
         return os.path.join(self.output_dir(*args, **kwargs), '{0}.{1}'.format(self.output_filename(*args, **kwargs), self.extension))
 
+    def hash_inputs(self):
+        """Return a list with every input of this format besides the
+        sprite hash, the sprite name and this format ``hash_settings``."""
+        return []
+
+    @cached_property
+    def hash(self):
+        """Return a hash of every input of this format. Changing a setting
+        only invalidates the formats that depend on it."""
+        settings = self.sprite.hash_config(self.hash_settings)
+        inputs = [self.sprite.hash, self.sprite.name, settings] + self.hash_inputs()
+        return hashlib.sha1(canonical_json(inputs)).hexdigest()[:10]
+
+    def page_formats(self, pages=None):
+        """Return this format for every page of the sprite.
+
+        :param pages: Number of pages to use if the sprite isn't processed.
+        """
+        return [self if sprite is self.sprite else self.__class__(sprite=sprite)
+                for sprite in self.sprite.get_pages(pages)]
+
+    def output_paths(self, pages=None):
+        """Return the paths of all the files generated by this format.
+
+        :param pages: Number of pages to use if the sprite isn't processed.
+        """
+        paths = []
+        for format in self.page_formats(pages):
+            if format.build_per_ratio:
+                paths.extend([format.output_path(ratio) for ratio in self.sprite.config['ratios']])
+            else:
+                paths.append(format.output_path())
+        return paths
+
     def build(self):
-        if self.build_per_ratio:
-            for ratio in self.sprite.config['ratios']:
-                self.save(ratio=ratio)
-        else:
-            self.save()
+        for task in self.build_tasks():
+            task()
+
+    def build_tasks(self):
+        """Return a list of functions saving every file of this format, one
+        for every page and ratio."""
+        formats = self.page_formats()
+        if len(formats) > 1 and not self.multipage:
+            raise ValidationError(("Error: Format '{0}' doesn't support sprites split "
+                                   "in several pages. '{1}' needs {2} pages to fit "
+                                   "in {3}px.").format(self.format_label, self.sprite.name,
+                                                       len(formats), self.sprite.config['max_size']))
+
+        tasks = []
+        for format in formats:
+            if format.build_per_ratio:
+                tasks.extend([functools.partial(format.save, ratio=ratio)
+                              for ratio in format.build_ratios()])
+            else:
+                tasks.append(format.save)
+        return tasks
+
+    def build_ratios(self):
+        """Return the ratios formats built per ratio need to save."""
+        return self.sprite.config['ratios']
 
     def save(self, *args, **kwargs):
         raise NotImplementedError
@@ -48,7 +119,9 @@ class BaseFormat(object):
         return True
 
     def validate(self):
-        pass
+        if self.sprite.config['allow_rotation'] and not self.rotation:
+            raise ValidationError(("Error: Format '{0}' can't use rotated images. "
+                                   "Disable it or don't use --allow-rotation.").format(self.format_label))
 
     @property
     def format_label(self):
@@ -78,19 +151,27 @@ class BaseTextFormat(BaseFormat):
         sprite_path = self.fix_windows_path(sprite_path)
         context = {'version': __version__,
                    'hash': self.sprite.hash,
+                   'format_hash': self.hash,
                    'name': self.sprite.name,
                    'sprite_path': sprite_path,
                    'sprite_filename': os.path.basename(sprite_path),
                    'width': round_up(self.sprite.canvas_size[0] / self.sprite.max_ratio),
                    'height': round_up(self.sprite.canvas_size[1] / self.sprite.max_ratio),
+                   'algorithm': self.sprite.algorithm,
+                   'ordering': self.sprite.algorithm_ordering,
+                   'page': getattr(self.sprite, 'index', 0),
+                   'pages': len(self.sprite.pages),
                    'images': [],
                    'ratios': {}}
 
         for i, img in enumerate(self.sprite.images):
-            base_x = img.x * -1 - img.margin[3] * self.sprite.max_ratio
-            base_y = img.y * -1 - img.margin[0] * self.sprite.max_ratio
-            base_abs_x = img.x + img.margin[3] * self.sprite.max_ratio
-            base_abs_y = img.y + img.margin[0] * self.sprite.max_ratio
+            # The margins of images rotated 90 degrees clockwise move too:
+            # the bottom one goes to the left and the left one to the top.
+            margin_left, margin_top = (img.margin[2], img.margin[3]) if img.rotated else (img.margin[3], img.margin[0])
+            base_x = img.x * -1 - margin_left * self.sprite.max_ratio
+            base_y = img.y * -1 - margin_top * self.sprite.max_ratio
+            base_abs_x = img.x + margin_left * self.sprite.max_ratio
+            base_abs_y = img.y + margin_top * self.sprite.max_ratio
 
             image = dict(filename=img.filename,
                          last=i == len(self.sprite.images) - 1,
@@ -102,6 +183,7 @@ class BaseTextFormat(BaseFormat):
                          width=round_up((img.width / self.sprite.max_ratio) + img.padding[1] + img.padding[3]),
                          original_width=img.original_width,
                          original_height=img.original_height,
+                         rotated=img.rotated,
                          ratios={})
 
             for r in self.sprite.ratios:
@@ -134,8 +216,7 @@ class BaseTextFormat(BaseFormat):
 
     def save(self, *args, **kwargs):
         # Create the destination directory if required
-        if not os.path.exists(self.output_dir(*args, **kwargs)):
-            os.makedirs(self.output_dir(*args, **kwargs))
+        makedirs(self.output_dir(*args, **kwargs))
 
         with codecs.open(self.output_path(*args, **kwargs), 'w', 'utf-8-sig') as f:
             f.write(self.render(*args, **kwargs))
@@ -148,14 +229,12 @@ class BaseJSONFormat(BaseTextFormat):
     def needs_rebuild(self):
         for ratio in self.sprite.config['ratios']:
             json_path = self.output_path(ratio)
-            if os.path.exists(json_path):
+            try:
                 with codecs.open(json_path, 'r', 'utf-8-sig') as f:
-                    try:
-                        data = json.loads(f.read())
-                        assert data[self.meta_key]['hash'] == self.sprite.hash
-                    except Exception:
-                        continue
-            return True
+                    data = json.loads(f.read())
+                    assert data[self.meta_key]['format_hash'] == self.hash
+            except Exception:
+                return True
         return False
 
     def render(self, *args, **kwargs):
@@ -173,13 +252,11 @@ class BasePlistFormat(BaseTextFormat):
     def needs_rebuild(self):
         for ratio in self.sprite.config['ratios']:
             cocos2d_path = self.output_path(ratio)
-            if os.path.exists(cocos2d_path):
-                try:
-                    data = plistlib.readPlist(cocos2d_path)
-                    assert data[self.meta_key]['hash'] == self.sprite.hash
-                except Exception:
-                    continue
-            return True
+            try:
+                data = plistlib.readPlist(cocos2d_path)
+                assert data[self.meta_key]['format_hash'] == self.hash
+            except Exception:
+                return True
         return False
 
 
@@ -187,6 +264,13 @@ class JinjaTextFormat(BaseTextFormat):
 
     template = ''
 
+    def hash_inputs(self):
+        inputs = super(JinjaTextFormat, self).hash_inputs()
+        custom_template = self.sprite.config.get('{0}_template'.format(self.format_label))
+        if custom_template:
+            inputs.append(file_digest(custom_template))
+        return inputs
+
     def render(self, *args, **kwargs):
         context = self.get_context(*args, **kwargs)
         template = self.template
@@ -7,6 +7,8 @@ class CAATFormat(BaseJSONFormat):
 
     extension = 'json'
     build_per_ratio = True
+    multipage = True
+    hash_settings = ['caat_dir', 'img_dir']
 
     @classmethod
     def populate_argument_parser(cls, parser):
@@ -25,9 +27,14 @@ class CAATFormat(BaseJSONFormat):
 
         data = dict(sprites={}, meta={'version': context['version'],
                                       'hash': context['hash'],
+                                      'format_hash': context['format_hash'],
                                       'sprite_filename': context['sprite_filename'],
                                       'width': context['width'],
-                                      'height': context['height']})
+                                      'height': context['height'],
+                                      'algorithm': context['algorithm'],
+                                      'ordering': context['ordering'],
+                                      'page': context['page'],
+                                      'pages': context['pages']})
         for i in context['images']:
             data['sprites'][i['filename']] = {"x" : i['abs_x'],
                                               "y" : i['abs_y'],
@@ -7,6 +7,9 @@ class Cocos2dFormat(BasePlistFormat):
 
     extension = 'plist'
     build_per_ratio = True
+    multipage = True
+    rotation = True
+    hash_settings = ['cocos2d_dir', 'img_dir']
 
     @classmethod
     def populate_argument_parser(cls, parser):
@@ -27,11 +30,16 @@ class Cocos2dFormat(BasePlistFormat):
         data = {'frames': {},
                 'metadata': {'version': context['version'],
                              'hash': context['hash'],
+                             'format_hash': context['format_hash'],
                              'size':'{{{width}, {height}}}'.format(**context['ratios'][ratio]),
                              'name': context['name'],
                              'format': 2,
                              'realTextureFileName': ratio_context['sprite_filename'],
-                             'textureFileName': ratio_context['sprite_filename']
+                             'textureFileName': ratio_context['sprite_filename'],
+                             'algorithm': context['algorithm'],
+                             'ordering': context['ordering'],
+                             'page': context['page'],
+                             'pages': context['pages']
                 }
         }
         for i in context['images']:
@@ -39,7 +47,7 @@ class Cocos2dFormat(BasePlistFormat):
             rect = '{{{{{abs_x}, {abs_y}}}, {{{width}, {height}}}}}'.format(**image_context)
             data['frames'][i['filename']] = {'frame': rect,
                                              'offset': '{0,0}',
-                                             'rotated': False,
+                                             'rotated': i['rotated'],
                                              'sourceColorRect': rect,
                                              'sourceSize': '{{{width}, {height}}}'.format(**image_context)}
         return data
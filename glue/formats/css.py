@@ -12,12 +12,16 @@ class CssFormat(JinjaTextFormat):
 
     extension = 'css'
     camelcase_separator = 'camelcase'
+    hash_settings = ['css_dir', 'img_dir', 'css_namespace', 'css_sprite_namespace',
+                     'css_url', 'css_cachebuster', 'css_cachebuster_filename',
+                     'css_cachebuster_only_sprites', 'css_separator',
+                     'css_pseudo_class_separator']
     css_pseudo_classes = set(['link', 'visited', 'active', 'hover', 'focus',
                               'first-letter', 'first-line', 'first-child',
                               'before', 'after'])
 
     template = u"""
-        /* glue: {{ version }} hash: {{ hash }} */
+        /* glue: {{ version }} hash: {{ format_hash }} */
         {% for image in images %}.{{ image.label }}{{ image.pseudo }}{%- if not image.last %},{{"\n"}}{%- endif %}{%- endfor %} {
             background-image: url('{{ sprite_path }}');
             background-repeat: no-repeat;
@@ -129,7 +133,7 @@ class CssFormat(JinjaTextFormat):
             parser.error("You can't use --cachebuster, --cachebuster-filename or --cachebuster-filename-only-sprites at the same time.")
 
     def needs_rebuild(self):
-        hash_line = '/* glue: %s hash: %s */\n' % (__version__, self.sprite.hash)
+        hash_line = '/* glue: %s hash: %s */\n' % (__version__, self.hash)
         try:
             with codecs.open(self.output_path(), 'r', 'utf-8-sig') as existing_css:
                 first_line = existing_css.readline()
@@ -139,6 +143,7 @@ class CssFormat(JinjaTextFormat):
         return False
 
     def validate(self):
+        super(CssFormat, self).validate()
         class_names = [':'.join(self.generate_css_name(i.filename)) for i in self.sprite.images]
         if len(set(class_names)) != len(self.sprite.images):
             dup = [i for i in self.sprite.images if class_names.count(':'.join(self.generate_css_name(i.filename))) > 1]
@@ -5,6 +5,7 @@ from .css import CssFormat
 class HtmlFormat(CssFormat):
 
     extension = 'html'
+    hash_settings = CssFormat.hash_settings + ['html_dir']
     template = u"""
         <html>
             <head><title>Glue Sprite Test Html</title>
@@ -57,4 +58,5 @@ class HtmlFormat(CssFormat):
         return True
 
     def validate(self):
-        return True
+        # Html files can use duplicated css class names.
+        return super(CssFormat, self).validate()
@@ -1,18 +1,27 @@
 import os
+import threading
 
 from PIL import Image as PILImage
 from PIL import PngImagePlugin
 
 from glue import __version__
-from glue.helpers import round_up, cached_property
+from glue.helpers import round_up, cached_property, makedirs
+from glue.png import write_png
 from .base import BaseFormat
 
 
 class ImageFormat(BaseFormat):
 
     build_per_ratio = True
+    multipage = True
+    rotation = True
+    threadsafe = True
     extension = 'png'
 
+    def __init__(self, *args, **kwargs):
+        super(ImageFormat, self).__init__(*args, **kwargs)
+        self._canvas_lock = threading.Lock()
+
     @classmethod
     def populate_argument_parser(cls, parser):
         group = parser.add_argument_group("Sprite image options")
@@ -30,6 +39,21 @@ class ImageFormat(BaseFormat):
                            default=os.environ.get('GLUE_GENERATE_IMG', True),
                            help="Don't genereate IMG files.")
 
+        group.add_argument("--no-cache",
+                           dest="cache",
+                           action="store_false",
+                           default=os.environ.get('GLUE_CACHE', True),
+                           help=("Don't keep a cache of the source images "
+                                 "next to the sprite images."))
+
+        group.add_argument("--cache-size",
+                           dest="cache_size",
+                           type=int,
+                           metavar='MB',
+                           default=os.environ.get('GLUE_CACHE_SIZE', 256),
+                           help=("Maximum size of the decoded source images "
+                                 "cache (default: 256)"))
+
         group.add_argument("-c", "--crop",
                            dest="crop",
                            action='store_true',
@@ -55,6 +79,15 @@ class ImageFormat(BaseFormat):
                            help=("The output image format will be png8 "
                                  "instead of png32"))
 
+        group.add_argument("--png-writer",
+                           dest="png_writer",
+                           type=unicode,
+                           choices=['pillow', 'parallel'],
+                           default=os.environ.get('GLUE_PNG_WRITER', 'pillow'),
+                           help=("Save the sprite images using pillow or "
+                                 "compressing them using --jobs threads "
+                                 "(default: pillow)"))
+
         group.add_argument("--ratios",
                            dest="ratios",
                            type=unicode,
@@ -74,17 +107,28 @@ class ImageFormat(BaseFormat):
             return '{0}_{1}'.format(filename, self.sprite.hash)
         return filename
 
+    def is_current(self, ratio):
+        """Return ``True`` if the image of this ``ratio`` was generated by
+        this version of glue for the current sprite hash."""
+        try:
+            existing = PILImage.open(self.output_path(ratio))
+            return all([existing.info[key] == value for key, value in self.png_text])
+        except Exception:
+            return False
+
     def needs_rebuild(self):
-        for ratio in self.sprite.config['ratios']:
-            image_path = self.output_path(ratio)
-            try:
-                existing = PILImage.open(image_path)
-                assert existing.info['Software'] == 'glue-%s' % __version__
-                assert existing.info['Comment'] == self.sprite.hash
-                continue
-            except Exception:
-                return True
-        return False
+        return not all(map(self.is_current, self.sprite.config['ratios']))
+
+    def build_ratios(self):
+        """Only the images which aren't current are saved again."""
+        if self.sprite.config['force']:
+            return self.sprite.config['ratios']
+        return [ratio for ratio in self.sprite.config['ratios'] if not self.is_current(ratio)]
+
+    @property
+    def png_text(self):
+        """Text chunks used to know if an image is current."""
+        return [('Software', 'glue-%s' % __version__), ('Comment', self.sprite.hash)]
 
     @cached_property
     def _raw_canvas(self):
@@ -93,14 +137,22 @@ class ImageFormat(BaseFormat):
         canvas = PILImage.new('RGBA', (width, height), (0, 0, 0, 0))
 
         # Paste the images inside the canvas
-        for image in self.sprite.images:
-            canvas.paste(image.image,
-                (round_up(image.x + (image.padding[3] + image.margin[3]) * self.sprite.max_ratio),
-                 round_up(image.y + (image.padding[0] + image.margin[0]) * self.sprite.max_ratio)))
+        for record in self.sprite.layout:
+            image = record.image
+            if image.rotated:
+                # Rotated 90 degrees clockwise: the left spacing goes to the
+                # top and the bottom spacing to the left.
+                canvas.paste(image.image.transpose(PILImage.ROTATE_270),
+                    (round_up(image.x + (image.padding[2] + image.margin[2]) * self.sprite.max_ratio),
+                     round_up(image.y + (image.padding[3] + image.margin[3]) * self.sprite.max_ratio)))
+            else:
+                canvas.paste(image.image,
+                    (round_up(image.x + (image.padding[3] + image.margin[3]) * self.sprite.max_ratio),
+                     round_up(image.y + (image.padding[0] + image.margin[0]) * self.sprite.max_ratio)))
 
         meta = PngImagePlugin.PngInfo()
-        meta.add_text('Software', 'glue-%s' % __version__)
-        meta.add_text('Comment', self.sprite.hash)
+        for key, value in self.png_text:
+            meta.add_text(key, value)
 
         # Customize how the png is going to be saved
         kwargs = dict(optimize=False, pnginfo=meta)
@@ -122,26 +174,26 @@ class ImageFormat(BaseFormat):
         return canvas, kwargs
 
     def save(self, ratio):
-        width, height = self.sprite.canvas_size
-        canvas, kwargs = self._raw_canvas
-
-        # Loop all over the ratios and save one image for each one
-        for ratio in self.sprite.config['ratios']:
-
-            # Create the destination directory if required
-            if not os.path.exists(self.output_dir(ratio=ratio)):
-                os.makedirs(self.output_dir(ratio=ratio))
-
-            image_path = self.output_path(ratio=ratio)
-
-            # If this canvas isn't the biggest one scale it using the ratio
-            if self.sprite.max_ratio != ratio:
-
-                reduced_canvas = canvas.resize(
-                                    (round_up((width / self.sprite.max_ratio) * ratio),
-                                     round_up((height / self.sprite.max_ratio) * ratio)),
-                                     PILImage.ANTIALIAS)
-                reduced_canvas.save(image_path, **kwargs)
-                # TODO: Use Imagemagick if it's available
-            else:
-                canvas.save(image_path, **kwargs)
+        # Every ratio is scaled from the same canvas, so it's only created
+        # once even if several ratios are saved at the same time.
+        with self._canvas_lock:
+            canvas, kwargs = self._raw_canvas
+
+        # Create the destination directory if required. Other ratios
+        # can be creating it at the same time.
+        makedirs(self.output_dir(ratio=ratio))
+
+        # If this canvas isn't the biggest one scale it using the ratio
+        if self.sprite.max_ratio != ratio:
+            width, height = self.sprite.canvas_size
+            canvas = canvas.resize((round_up((width / self.sprite.max_ratio) * ratio),
+                                    round_up((height / self.sprite.max_ratio) * ratio)),
+                                   PILImage.ANTIALIAS)
+            # TODO: Use Imagemagick if it's available
+
+        if self.sprite.config['png_writer'] == 'parallel':
+            write_png(canvas, self.output_path(ratio=ratio), text=self.png_text,
+                      transparency=kwargs.get('transparency'),
+                      threads=int(self.sprite.config['jobs']))
+        else:
+            canvas.save(self.output_path(ratio=ratio), **kwargs)
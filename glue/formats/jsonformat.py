@@ -9,6 +9,9 @@ class JSONFormat(BaseJSONFormat):
 
     extension = 'json'
     build_per_ratio = True
+    multipage = True
+    rotation = True
+    hash_settings = ['json_dir', 'img_dir', 'json_format']
 
     @classmethod
     def populate_argument_parser(cls, parser):
@@ -38,7 +41,7 @@ class JSONFormat(BaseJSONFormat):
                                                   'y': i['y'],
                                                   'w': i['width'],
                                                   'h': i['height']},
-                                        'rotated': False,
+                                        'rotated': i['rotated'],
                                         'trimmed': False,
                                         'spriteSourceSize': {'x': i['x'],
                                                              'y': i['y'],
@@ -49,11 +52,16 @@ class JSONFormat(BaseJSONFormat):
 
         data = dict(frames=None, meta={'version': context['version'],
                                        'hash': context['hash'],
+                                       'format_hash': context['format_hash'],
                                        'name': context['name'],
                                        'sprite_path': context['sprite_path'],
                                        'sprite_filename': context['sprite_filename'],
                                        'width': context['width'],
-                                       'height': context['height']})
+                                       'height': context['height'],
+                                       'algorithm': context['algorithm'],
+                                       'ordering': context['ordering'],
+                                       'page': context['page'],
+                                       'pages': context['pages']})
 
         if self.sprite.config['json_format'] == 'array':
             data['frames'] = frames.values()
@@ -6,8 +6,9 @@ from css import CssFormat
 class LessFormat(CssFormat):
 
     extension = 'less'
+    hash_settings = CssFormat.hash_settings + ['less_dir']
     template = u"""
-        /* glue: {{ version }} hash: {{ hash }} */
+        /* glue: {{ version }} hash: {{ format_hash }} */
         {% for image in images %}.{{ image.label }}{{ image.pseudo }}{%- if not image.last %}, {%- endif %}{%- endfor %}{
             background-image:url('{{ sprite_path }}');
             background-repeat:no-repeat;
@@ -6,6 +6,7 @@ from css import CssFormat
 class ScssFormat(CssFormat):
 
     extension = 'scss'
+    hash_settings = CssFormat.hash_settings + ['scss_dir']
 
     @classmethod
     def populate_argument_parser(cls, parser):
@@ -1,5 +1,8 @@
 import os
 import sys
+import json
+import errno
+import UserDict
 import contextlib
 from StringIO import StringIO
 
@@ -10,6 +13,14 @@ def round_up(value):
     return int_value + diff if value != int_value else int_value
 
 
+def next_power_of_two(value):
+    """Return the smallest power of two greater or equal than ``value``."""
+    power = 1
+    while power < value:
+        power *= 2
+    return power
+
+
 def nearest_fration(value):
     """
     Return the nearest fraction.
@@ -24,6 +35,47 @@ def nearest_fration(value):
         return '%i/100' % int(float(value) * 100)
 
 
+def canonical_json(value):
+    """Return a canonical json representation of ``value`` suitable for
+    hashing. Keys are sorted and floats use a fixed precision so the result
+    doesn't depend on the interpreter or on dict ordering."""
+
+    def canonical(value):
+        if isinstance(value, float):
+            return '%.6f' % value
+        if isinstance(value, dict):
+            return dict([(unicode(k), canonical(v)) for k, v in value.iteritems()])
+        if isinstance(value, (list, tuple)):
+            return [canonical(v) for v in value]
+        return value
+
+    return json.dumps(canonical(value), sort_keys=True, separators=(',', ':'), default=unicode)
+
+
+def makedirs(path):
+    """Create the ``path`` directory and its parents unless it already
+    exists, even if another thread creates it at the same time."""
+    try:
+        os.makedirs(path)
+    except OSError, e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+
+def write_json(path, data):
+    """Write ``data`` as json to ``path`` atomically, so an interrupted run
+    can't leave a corrupted file behind."""
+    dirname = os.path.dirname(path)
+    if dirname:
+        makedirs(dirname)
+
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, sort_keys=True)
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(path + '.tmp', path)
+
+
 class _Missing(object):
     """ Missing object necessary for cached_property"""
     def __repr__(self):
@@ -60,6 +112,41 @@ class cached_property(object):
         return value
 
 
+class LayeredConfig(UserDict.DictMixin):
+    """
+    Dictionary-like configuration which only stores its own settings and
+    falls back to a parent configuration for everything else.
+
+    Writes are always stored in this layer, so the parent configuration is
+    never modified and there is no need to copy it."""
+
+    def __init__(self, parent=None, overrides=None):
+        self.parent = {} if parent is None else parent
+        self.overrides = dict(overrides or {})
+
+    def __getitem__(self, key):
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.parent[key]
+
+    def __setitem__(self, key, value):
+        self.overrides[key] = value
+
+    def __delitem__(self, key):
+        del self.overrides[key]
+
+    def __contains__(self, key):
+        return key in self.overrides or key in self.parent
+
+    def keys(self):
+        keys = list(self.parent.keys())
+        keys.extend([k for k in self.overrides if k not in self.parent])
+        return keys
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+
 @contextlib.contextmanager
 def redirect_stdout(stream=None):
     stream = stream or StringIO()
@@ -1,5 +1,8 @@
+from multiprocessing.pool import ThreadPool
+
 from glue.core import Sprite
 from glue.formats import formats
+from glue.manifest import BuildManifest
 
 
 class BaseManager(object):
@@ -33,15 +36,63 @@ class BaseManager(object):
             sprite.validate()
 
     def save(self):
-        """Save all sprites inside this manager."""
+        """Save all sprites inside this manager.
+
+        Sprites are only processed if any of their formats needs to be
+        rebuilt, so up to date sprites never decode or place their images.
+        The build manifest is checked first, falling back to each format's
+        own check if it has no record of the outputs.
+        """
+        manifest = BuildManifest(self.config['output'] or self.config['img_dir'])
 
         for format_name in self.config['enabled_formats']:
             format_cls = formats[format_name]
+            pending = []
             for sprite in self.sprites:
                 format = format_cls(sprite=sprite)
                 format.validate()
-                if format.needs_rebuild() or sprite.config['force']:
+                current = recorded = manifest.is_current(sprite, format)
+                if recorded is None:
+                    current = not format.needs_rebuild()
+
+                if sprite.config['force'] or not current:
                     print "Format '{0}' for sprite '{1}' needs rebuild...".format(format_name, sprite.name)
-                    format.build()
+                    sprite.process()
+                    pending.append(format)
                 else:
                     print "Format '{0}'' for sprite '{1}' already exists...".format(format_name, sprite.name)
+                    if recorded is None:
+                        manifest.update(sprite, format)
+
+            self.build(pending)
+            for format in pending:
+                manifest.update(format.sprite, format)
+
+        manifest.save()
+
+    def build(self, formats):
+        """Build all the ``formats``. Files of thread-safe formats, like
+        every page and ratio of the sprite images, are saved at the same
+        time using up to ``jobs`` threads.
+
+        Hashes are calculated before starting the threads, as the first
+        one to need them would update the shared caches."""
+        tasks = []
+        for format in formats:
+            format.hash
+            if format.threadsafe:
+                tasks.extend(format.build_tasks())
+            else:
+                format.build()
+
+        threads = min(int(self.config['jobs']), len(tasks))
+        if threads > 1:
+            pool = ThreadPool(threads)
+            try:
+                pool.map(lambda task: task(), tasks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for task in tasks:
+                task()
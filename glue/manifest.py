@@ -0,0 +1,62 @@
+import os
+import json
+
+from glue import __version__
+from glue.cache import file_digest
+from glue.helpers import write_json
+
+
+class BuildManifest(object):
+    """Record of the files generated inside an output tree.
+
+    For every sprite and format it stores the format hash used to build it
+    and the digest of every output file. Knowing if a whole project is up to
+    date only requires reading this file and checking the outputs still
+    exist.
+    """
+
+    filename = 'glue-manifest.json'
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        try:
+            with open(os.path.join(self.path, self.filename)) as f:
+                data = json.load(f)
+            assert data['version'] == __version__
+            self.sprites = data['sprites']
+        except Exception:
+            self.sprites = {}
+
+    def _relpath(self, path):
+        return os.path.relpath(path, self.path).replace(os.sep, '/')
+
+    def is_current(self, sprite, format):
+        """Return ``True`` if the outputs of ``format`` for ``sprite`` were
+        built using the current format hash and they all still exist, or
+        ``None`` if the manifest has no record of them."""
+        entry = self.sprites.get(sprite.name, {}).get(format.format_label)
+        if not entry:
+            return None
+        if entry['hash'] != format.hash:
+            return False
+
+        paths = format.output_paths(entry.get('pages'))
+        if sorted(entry['outputs']) != sorted(map(self._relpath, paths)):
+            return False
+        return all(map(os.path.exists, paths))
+
+    def update(self, sprite, format):
+        """Record the current outputs of ``format`` for ``sprite``."""
+        outputs = dict([(self._relpath(p), file_digest(p)) for p in format.output_paths()])
+        self.sprites.setdefault(sprite.name, {})[format.format_label] = {'hash': format.hash,
+                                                                          'pages': len(sprite.get_pages()),
+                                                                          'outputs': outputs}
+        self.dirty = True
+
+    def save(self):
+        """Write the manifest to disk if it has changed."""
+        if self.dirty:
+            write_json(os.path.join(self.path, self.filename), {'version': __version__,
+                                                                'sprites': self.sprites})
+            self.dirty = False
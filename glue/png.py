@@ -0,0 +1,135 @@
+import zlib
+import struct
+from multiprocessing.pool import ThreadPool
+
+from PIL import Image as PILImage
+from PIL import ImageChops
+
+
+PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+
+# Color type and bytes per pixel of every supported mode.
+PNG_MODES = {'RGBA': (6, 4), 'RGB': (2, 3), 'L': (0, 1), 'P': (3, 1)}
+
+# Up filter: every byte is stored as the difference with the byte above.
+FILTER_UP = '\x02'
+
+
+def chunk(chunk_type, data):
+    """Return a png chunk of this type with its length and crc."""
+    crc = zlib.crc32(chunk_type + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+
+def filter_up(image, top, bottom):
+    """Return the rows from ``top`` to ``bottom`` of ``image`` filtered
+    using the Up filter, every one of them starting with its filter type.
+
+    Only these rows and the one above them are copied. They are handled as
+    a grayscale image one byte per pixel wide, so the filter is applied by
+    Pillow subtracting the rows shifted one row down, without looping over
+    the pixels in Python.
+
+    :param image: PIL image.
+    :param top: First row.
+    :param bottom: Row after the last one.
+    """
+    width = image.size[0]
+    stride = width * PNG_MODES[image.mode][1]
+    first = max(top - 1, 0)
+    raw = PILImage.frombytes('L', (stride, bottom - first), image.crop((0, first, width, bottom)).tobytes())
+    above = ImageChops.offset(raw, 0, 1)
+    above.paste(0, (0, 0, stride, 1))
+    pixels = ImageChops.subtract_modulo(raw, above).tobytes()
+    return ''.join([FILTER_UP + pixels[y * stride:(y + 1) * stride] for y in range(top - first, bottom - first)])
+
+
+def adler32_combine(first, second, length):
+    """Return the adler32 checksum of two concatenated strings given the
+    checksum of each one and the length of the second one, like zlib's
+    ``adler32_combine``."""
+    base = 65521
+    remainder = length % base
+    low = first & 0xffff
+    high = (remainder * low) % base
+    low += (second & 0xffff) + base - 1
+    high += ((first >> 16) & 0xffff) + ((second >> 16) & 0xffff) + base - remainder
+    return (low % base) | ((high % base) << 16)
+
+
+def deflate_band(args):
+    """Filter and deflate a band of rows as part of a bigger zlib stream.
+    Return the compressed data, and the adler32 checksum and length of the
+    uncompressed data.
+
+    Every band but the last one ends with a sync flush, so they end on a
+    byte boundary and can be concatenated.
+    """
+    image, top, bottom, level = args
+    data = filter_up(image, top, bottom)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    last = bottom == image.size[1]
+    compressed = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return compressed, zlib.adler32(data) & 0xffffffff, len(data)
+
+
+def write_png(image, path, text=None, transparency=None, level=6, threads=1,
+              band_size=1024 * 1024):
+    """Save ``image`` as a png file compressing bands of scanlines on
+    several threads, like pigz does.
+
+    Bands are filtered and deflated independently and stitched together in
+    one zlib stream, so the file is a regular png which decodes to the same
+    pixels. Only the bands being compressed are copied, never the whole
+    image. The compression ratio is slightly worse than a single stream as
+    every band starts without any history.
+
+    :param image: RGBA, RGB, L or P PIL image.
+    :param path: Output path.
+    :param text: List of keyword and text pairs to add as text chunks.
+    :param transparency: Palette index of the transparent color of P images.
+    :param level: zlib compression level.
+    :param threads: Number of threads used to deflate the bands.
+    :param band_size: Approximate size in bytes of every band.
+    """
+    if image.mode not in PNG_MODES:
+        raise ValueError("Unable to save {0} images as png.".format(image.mode))
+
+    color_type, bytes_per_pixel = PNG_MODES[image.mode]
+    width, height = image.size
+    stride = width * bytes_per_pixel
+    image.load()
+
+    rows_per_band = max(band_size // (stride + 1), 1)
+    bands = [(image, top, min(top + rows_per_band, height), level)
+             for top in range(0, height, rows_per_band)]
+
+    threads = min(threads, len(bands))
+    if threads > 1:
+        pool = ThreadPool(threads)
+        try:
+            compressed = pool.map(deflate_band, bands)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        compressed = map(deflate_band, bands)
+
+    checksum = 1
+    for data, band_checksum, length in compressed:
+        checksum = adler32_combine(checksum, band_checksum, length)
+
+    # zlib header for a 32K window and the default compression strategy
+    idat = '\x78\x9c' + ''.join([data for data, band_checksum, length in compressed]) + struct.pack('>I', checksum)
+
+    with open(path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(chunk('IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)))
+        if image.mode == 'P':
+            f.write(chunk('PLTE', ''.join(map(chr, image.getpalette()))))
+            if transparency is not None:
+                f.write(chunk('tRNS', '\xff' * transparency + '\x00'))
+        for key, value in text or []:
+            f.write(chunk('tEXt', '{0}\0{1}'.format(key, value)))
+        f.write(chunk('IDAT', idat))
+        f.write(chunk('IEND', ''))
@@ -1,10 +1,14 @@
 import os
 import sys
+import time
 import json
+import zlib
 import codecs
+import struct
 import shutil
 import unittest
 import logging
+import ConfigParser
 from StringIO import StringIO
 from plistlib import readPlist
 
@@ -13,8 +17,13 @@ import cssutils
 from mock import patch, Mock
 
 from glue.bin import main
-from glue.core import Image
-from glue.helpers import redirect_stdout
+from glue.core import Image, decode_image
+from glue.cache import ImageCache
+from glue.algorithms.auto import AutoAlgorithm
+from glue.algorithms.vertical import VerticalAlgorithm
+from glue.algorithms.layout import LayoutRecord, FilenameLayoutRecord
+from glue.helpers import redirect_stdout, LayeredConfig
+from glue.png import write_png
 
 
 RED = (255, 0, 0, 255)
@@ -34,6 +43,14 @@ COLORS = {RED: 'RED',
           TRANSPARENT: 'TRANSPARENT'}
 
 
+class SlowAlgorithm(VerticalAlgorithm):
+    """Vertical algorithm taking too long for any auto budget."""
+
+    def process(self, sprite):
+        time.sleep(30)
+        super(SlowAlgorithm, self).process(sprite)
+
+
 class TestGlue(unittest.TestCase):
 
     TEST_PATH = 'tests_tmp/'
@@ -77,6 +94,28 @@ class TestGlue(unittest.TestCase):
             if not match:
                 assert False, "{0} {1} should be {2} but is {3}".format(path, point, COLORS.get(color, color), COLORS.get(image_color, image_color))
 
+    def assertPacked(self, path, count):
+        """Check that the ``count`` frames of the json file ``path`` are
+        inside the sprite and don't overlap."""
+        with codecs.open(path, 'r', 'utf-8-sig') as f:
+            data = json.loads(f.read())
+        width, height = PILImage.open(os.path.splitext(path)[0] + '.png').size
+
+        rects = []
+        for f in data['frames']:
+            x, y, w, h = -f['frame']['x'], -f['frame']['y'], f['frame']['w'], f['frame']['h']
+            # Frames of rotated images have their original size
+            if f.get('rotated'):
+                w, h = h, w
+            rects.append((x, y, x + w, y + h))
+        self.assertEqual(len(rects), count)
+        for i, a in enumerate(rects):
+            assert a[0] >= 0 and a[1] >= 0 and a[2] <= width and a[3] <= height, \
+                "{0} is outside the sprite".format(a)
+            for b in rects[i + 1:]:
+                assert a[2] <= b[0] or b[2] <= a[0] or a[3] <= b[1] or b[3] <= a[1], \
+                    "{0} overlaps {1}".format(a, b)
+
     def assertCSS(self, path, class_name, properties, ratio=None):
         stylesheet = cssutils.parseFile(path, validate=False)
 
@@ -484,6 +523,363 @@ class TestGlue(unittest.TestCase):
                         u'width': u'16px',
                         u'height': u'16px'})
 
+    def test_algorithm_square_layout(self):
+        # Positions generated by the original recursive implementation.
+        layout = {(64, 40): (0, 0), (12, 60): (0, 40), (56, 56): (64, 0),
+                  (30, 52): (12, 40), (48, 20): (64, 56), (44, 44): (120, 0),
+                  (40, 10): (120, 44), (36, 28): (120, 54), (14, 32): (42, 40),
+                  (28, 28): (0, 100), (24, 8): (120, 82), (20, 16): (64, 76),
+                  (16, 12): (84, 76), (10, 8): (144, 82), (8, 4): (156, 54)}
+        for size in layout:
+            self.create_image("simple/{0}x{1}.png".format(*size), RED, size)
+
+        code = self.call("glue simple output --algorithm=square --json")
+        self.assertEqual(code, 0)
+        self.assertEqual(PILImage.open("output/simple.png").size, (164, 128))
+
+        with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+            data = json.loads(f.read())
+        for frame in data['frames']:
+            size = tuple(map(int, frame['filename'][:-4].split('x')))
+            self.assertEqual((-frame['frame']['x'], -frame['frame']['y']), layout[size])
+
+    def test_algorithm_maxrects(self):
+        sizes = [(56, 32), (32, 64), (24, 24), (32, 32), (24, 40), (48, 40)]
+        for i, size in enumerate(sizes):
+            self.create_image("simple/{0}.png".format(i), RED, size)
+
+        code = self.call("glue simple square --algorithm=square")
+        self.assertEqual(code, 0)
+        square_width, square_height = PILImage.open("square/simple.png").size
+
+        for heuristic in ['best-short-side', 'best-long-side', 'best-area', 'bottom-left']:
+            code = self.call("glue simple {0} --algorithm=maxrects "
+                             "--maxrects-heuristic={0} --json".format(heuristic))
+            self.assertEqual(code, 0)
+
+            width, height = PILImage.open("{0}/simple.png".format(heuristic)).size
+            self.assertTrue(width * height < square_width * square_height)
+
+            self.assertPacked("{0}/simple.json".format(heuristic), len(sizes))
+
+    def test_algorithm_skyline(self):
+        sizes = [(64, 64), (16, 48), (40, 16), (32, 32), (24, 24), (8, 8)]
+        for i, size in enumerate(sizes):
+            self.create_image("simple/{0}.png".format(i), RED, size)
+
+        code = self.call("glue simple output --algorithm=skyline --json")
+        self.assertEqual(code, 0)
+
+        self.assertExists("output/simple.png")
+        self.assertPacked("output/simple.json", len(sizes))
+        self.assertEqual(PILImage.open("output/simple.png").size, (80, 104))
+
+    def test_algorithm_grid(self):
+        for i in range(7):
+            self.create_image("simple/{0}.png".format(i), RED, (16, 16))
+
+        code = self.call("glue simple output --algorithm=grid --json")
+        self.assertEqual(code, 0)
+        self.assertEqual(PILImage.open("output/simple.png").size, (48, 48))
+        self.assertPacked("output/simple.json", 7)
+
+        with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+            frames = [f['frame'] for f in json.loads(f.read())['frames']]
+        for frame in frames:
+            self.assertEqual(frame['x'] % 16, 0)
+            self.assertEqual(frame['y'] % 16, 0)
+
+    def test_algorithm_grid_mixed(self):
+        for i in range(4):
+            self.create_image("simple/big{0}.png".format(i), RED, (32, 32))
+        for i in range(8):
+            self.create_image("simple/small{0}.png".format(i), BLUE, (16, 16))
+
+        code = self.call("glue simple output --algorithm=grid --json")
+        self.assertEqual(code, 0)
+        self.assertEqual(PILImage.open("output/simple.png").size, (64, 96))
+        self.assertPacked("output/simple.json", 12)
+        self.assertColor("output/simple.png", RED, ((0, 0), (63, 63)))
+        self.assertColor("output/simple.png", BLUE, ((0, 64), (63, 95)))
+
+    def test_algorithm_grid_many_sizes(self):
+        sizes = [(8 + i % 6 * 9, 8 + i % 5 * 11) for i in range(120)]
+        for i, size in enumerate(sizes):
+            self.create_image("simple/{0}.png".format(i), RED, size)
+
+        code = self.call("glue simple output --algorithm=grid --json")
+        self.assertEqual(code, 0)
+        self.assertPacked("output/simple.json", len(sizes))
+
+        # Images are grouped by size class instead of by exact size
+        width, height = PILImage.open("output/simple.png").size
+        area = sum([w * h for w, h in sizes])
+        self.assertTrue(area / float(width * height) > 0.75)
+
+    def test_algorithm_auto(self):
+        sizes = [(56, 32), (32, 64), (24, 24), (32, 32), (24, 40), (48, 40)]
+        for i, size in enumerate(sizes):
+            self.create_image("simple/{0}.png".format(i), RED, size)
+
+        code = self.call("glue simple square --algorithm=square")
+        self.assertEqual(code, 0)
+        square_width, square_height = PILImage.open("square/simple.png").size
+
+        code = self.call("glue simple output --algorithm=auto --json")
+        self.assertEqual(code, 0)
+        width, height = PILImage.open("output/simple.png").size
+        self.assertTrue(width * height < square_width * square_height)
+        self.assertPacked("output/simple.json", len(sizes))
+
+        with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+            meta = json.loads(f.read())['meta']
+        self.assertTrue((meta['algorithm'], meta['ordering']) in AutoAlgorithm.candidates)
+
+        # The same layout is chosen packing the candidates in parallel. The
+        # format hash depends on the output directory.
+        code = self.call("glue simple parallel --algorithm=auto --json --jobs=2")
+        self.assertEqual(code, 0)
+        with codecs.open('parallel/simple.json', 'r', 'utf-8-sig') as f:
+            parallel_meta = json.loads(f.read())['meta']
+        del meta['format_hash'], parallel_meta['format_hash']
+        self.assertEqual(parallel_meta, meta)
+
+        # Without any time only the first candidate is used
+        code = self.call("glue simple budget --algorithm=auto --json --auto-budget=0")
+        self.assertEqual(code, 0)
+        with codecs.open('budget/simple.json', 'r', 'utf-8-sig') as f:
+            meta = json.loads(f.read())['meta']
+        self.assertEqual((meta['algorithm'], meta['ordering']), AutoAlgorithm.candidates[0])
+
+    def test_algorithm_auto_budget_slow_candidate(self):
+        for i in range(4):
+            self.create_image("simple/{0}.png".format(i), RED, (32, 32))
+
+        # Candidates finishing after a slow one are still used
+        candidates = [('vertical', 'maxside'), ('slow', 'maxside'), ('square', 'maxside')]
+        with patch.dict('glue.algorithms.algorithms', {'slow': SlowAlgorithm}):
+            with patch.object(AutoAlgorithm, 'candidates', candidates):
+                start = time.time()
+                code = self.call("glue simple output --algorithm=auto --json --jobs=3 --auto-budget=1")
+                self.assertEqual(code, 0)
+                self.assertTrue(time.time() - start < 20)
+
+        with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+            meta = json.loads(f.read())['meta']
+        self.assertEqual((meta['algorithm'], meta['ordering']), ('square', 'maxside'))
+
+    def test_optimize(self):
+        sizes = [(54, 12), (20, 61), (37, 37), (9, 44), (61, 25), (30, 18),
+                 (12, 57), (45, 9), (26, 40), (63, 31), (16, 16), (33, 50)]
+        for i, size in enumerate(sizes):
+            self.create_image("simple/{0:02d}.png".format(i), RED, size)
+
+        code = self.call("glue simple greedy --algorithm=skyline --json")
+        self.assertEqual(code, 0)
+        width, height = PILImage.open("greedy/simple.png").size
+
+        code, out = self.call("glue simple output --algorithm=skyline --json "
+                              "--optimize=200 --optimize-seed=1", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("Layout optimized" in out)
+        self.assertPacked("output/simple.json", len(sizes))
+        optimized_width, optimized_height = PILImage.open("output/simple.png").size
+        self.assertTrue(optimized_width * optimized_height < width * height)
+
+        # The same seed always generates the same sprite
+        code = self.call("glue simple again --algorithm=skyline --json "
+                         "--optimize=200 --optimize-seed=1")
+        self.assertEqual(code, 0)
+        with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+            frames = json.loads(f.read())['frames']
+        with codecs.open('again/simple.json', 'r', 'utf-8-sig') as f:
+            self.assertEqual(json.loads(f.read())['frames'], frames)
+
+    def test_max_size(self):
+        for i in range(5):
+            self.create_image("simple/{0}.png".format(i), RED, (64, 64))
+        code = self.call("glue simple output --max-size=128 --json --cocos2d --caat=caat --no-css")
+        self.assertEqual(code, 0)
+
+        # Four images fit in every 128x128 page
+        self.assertEqual(PILImage.open("output/simple-0.png").size, (128, 128))
+        self.assertEqual(PILImage.open("output/simple-1.png").size, (64, 64))
+        self.assertDoesNotExists("output/simple.png")
+
+        self.assertPacked("output/simple-0.json", 4)
+        self.assertPacked("output/simple-1.json", 1)
+        with codecs.open('output/simple-1.json', 'r', 'utf-8-sig') as f:
+            meta = json.loads(f.read())['meta']
+        self.assertEqual((meta['page'], meta['pages']), (1, 2))
+        self.assertEqual(meta['sprite_filename'], 'simple-1.png')
+
+        with codecs.open('caat/simple-0.json', 'r', 'utf-8-sig') as f:
+            caat = json.loads(f.read())
+        self.assertEqual(len(caat['sprites']), 4)
+        self.assertEqual(caat['meta']['sprite_filename'], 'simple-0.png')
+
+        plist = readPlist('output/simple-1.plist')
+        self.assertEqual(len(plist['frames']), 1)
+        self.assertEqual(plist['metadata']['textureFileName'], 'simple-1.png')
+        self.assertEqual(plist['metadata']['page'], 1)
+
+        # Nothing is rebuilt if nothing has changed
+        code, out = self.call("glue simple output --max-size=128 --json --cocos2d --caat=caat --no-css", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("needs rebuild" not in out)
+
+        # Formats without pages support fail
+        code = self.call("glue simple css --max-size=128")
+        self.assertEqual(code, 3)
+
+        code = self.call("glue simple big --max-size=32")
+        self.assertEqual(code, 3)
+
+    def test_pot(self):
+        self.create_image("simple/red.png", RED, (64, 64))
+        self.create_image("simple/blue.png", BLUE, (32, 32))
+        code = self.call("glue simple output --pot --algorithm=horizontal")
+        self.assertEqual(code, 0)
+        self.assertEqual(PILImage.open("output/simple.png").size, (128, 64))
+        self.assertColor("output/simple.png", TRANSPARENT, ((96, 0), (127, 63)))
+        self.assertCSS(u"output/simple.css", u'.sprite-simple-blue',
+                       {u'background-image': u"url(simple.png)",
+                        u'background-repeat': u'no-repeat',
+                        u'background-position': u'-64px 0',
+                        u'width': u'32px',
+                        u'height': u'32px'})
+
+    def test_allow_rotation(self):
+        self.create_image("simple/square.png", YELLOW, (64, 64))
+
+        # Tall image, red on the top half and blue on the bottom one
+        image = PILImage.new('RGB', (16, 48), RED)
+        image.paste(BLUE, (0, 24, 16, 48))
+        image.save("simple/tall.png")
+
+        code = self.call("glue simple output --algorithm=skyline --allow-rotation --json --cocos2d --no-css")
+        self.assertEqual(code, 0)
+
+        # The tall image lies down under the square one, rotated clockwise
+        self.assertEqual(PILImage.open("output/simple.png").size, (64, 80))
+        self.assertColor("output/simple.png", BLUE, ((0, 64), (23, 79)))
+        self.assertColor("output/simple.png", RED, ((24, 64), (47, 79)))
+
+        with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+            frames = dict([(f['filename'], f) for f in json.loads(f.read())['frames']])
+        self.assertTrue(frames['tall.png']['rotated'])
+        self.assertFalse(frames['square.png']['rotated'])
+        self.assertEqual(frames['tall.png']['frame'], {'x': 0, 'y': -64, 'w': 16, 'h': 48})
+
+        plist = readPlist('output/simple.plist')
+        self.assertTrue(plist['frames']['tall.png']['rotated'])
+        self.assertEqual(plist['frames']['tall.png']['frame'], '{{0, 64}, {16, 48}}')
+
+        # Css can't rotate backgrounds
+        code = self.call("glue simple css --algorithm=skyline --allow-rotation")
+        self.assertEqual(code, 3)
+
+    def test_incremental(self):
+        def frames():
+            with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+                return dict([(f['filename'], f['frame']) for f in json.loads(f.read())['frames']])
+
+        self.create_image("simple/red.png", RED, (64, 64))
+        self.create_image("simple/blue.png", BLUE, (48, 48))
+        self.create_image("simple/green.png", GREEN, (32, 32))
+        self.create_image("simple/yellow.png", YELLOW, (16, 16))
+        code = self.call("glue simple output --incremental --json")
+        self.assertEqual(code, 0)
+        previous = frames()
+
+        # New images don't move the previous ones
+        self.create_image("simple/pink.png", PINK, (56, 56))
+        code = self.call("glue simple output --incremental --json --css")
+        self.assertEqual(code, 0)
+        current = frames()
+        for filename, frame in previous.items():
+            self.assertEqual(current[filename], frame)
+        self.assertPacked("output/simple.json", 5)
+        self.assertCSS(u"output/simple.css", u'.sprite-simple-blue',
+                       {u'background-image': u"url(simple.png)",
+                        u'background-repeat': u'no-repeat',
+                        u'background-position': u'-64px 0',
+                        u'width': u'48px',
+                        u'height': u'48px'})
+
+        # New images use the space of removed ones
+        size = PILImage.open("output/simple.png").size
+        os.remove("simple/green.png")
+        self.create_image("simple/cyan.png", CYAN, (24, 24))
+        code = self.call("glue simple output --incremental --json")
+        self.assertEqual(code, 0)
+        self.assertEqual(PILImage.open("output/simple.png").size, size)
+        self.assertEqual(frames()['red.png'], previous['red.png'])
+        self.assertPacked("output/simple.json", 5)
+
+        # Sprites wasting more space than before are placed again
+        os.remove("simple/red.png")
+        code = self.call("glue simple output --incremental --repack-threshold=0 --json --force")
+        self.assertEqual(code, 0)
+        current = frames()
+        code = self.call("glue simple fresh --json")
+        self.assertEqual(code, 0)
+        with codecs.open('fresh/simple.json', 'r', 'utf-8-sig') as f:
+            fresh = dict([(f['filename'], f['frame']) for f in json.loads(f.read())['frames']])
+        self.assertEqual(current, fresh)
+
+    def test_incremental_wasteful_layout(self):
+        def frames():
+            with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+                return dict([(f['filename'], f['frame']) for f in json.loads(f.read())['frames']])
+
+        self.create_image("simple/red.png", RED, (64, 64))
+        self.create_image("simple/blue.png", BLUE, (40, 40))
+        self.create_image("simple/green.png", GREEN, (40, 40))
+        code = self.call("glue simple output --incremental --json")
+        self.assertEqual(code, 0)
+        previous = frames()
+        with open("output/.glue-cache/layouts/simple.json") as f:
+            self.assertTrue(json.load(f)['packed_waste'] > 0.3)
+
+        # Sprites already wasting space aren't placed again on every build
+        self.create_image("simple/yellow.png", YELLOW, (8, 8))
+        code, out = self.call("glue simple output --incremental --json", capture=True)
+        self.assertEqual(code, 0)
+        self.assertFalse("Layout placed again" in out)
+        current = frames()
+        for filename, frame in previous.items():
+            self.assertEqual(current[filename], frame)
+
+        # Unless the wasted space grows more than the threshold
+        self.create_image("simple/pink.png", PINK, (8, 300))
+        code, out = self.call("glue simple output --incremental --json", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("wasted space grew" in out)
+        self.assertPacked("output/simple.json", 5)
+
+        # Sprites which could be split in pages are always placed again,
+        # but their layout is still stored
+        code = self.call("glue simple output --incremental --json --max-size=512")
+        self.assertEqual(code, 0)
+        self.assertExists("output/.glue-cache/layouts/simple.json")
+
+    def test_incremental_auto_rotation(self):
+        for i in range(30):
+            size = (8 + i % 7 * 5, 40 + i % 5 * 6) if i % 2 else (40 + i % 5 * 6, 8 + i % 7 * 5)
+            self.create_image("simple/{0:02d}.png".format(i), RED, size)
+
+        options = "--algorithm=auto --allow-rotation --incremental --json --no-css"
+        code = self.call("glue simple output " + options)
+        self.assertEqual(code, 0)
+        self.assertPacked("output/simple.json", 30)
+
+        # Too wide for the previous canvas, so everything is placed again
+        self.create_image("simple/wide.png", BLUE, (400, 10))
+        code = self.call("glue simple output " + options)
+        self.assertEqual(code, 0)
+        self.assertPacked("output/simple.json", 31)
+
     def test_no_img_with_img(self):
         self.create_image("simple/red.png", RED)
         self.create_image("simple/blue.png", BLUE)
@@ -507,6 +903,23 @@ class TestGlue(unittest.TestCase):
                         u'width': u'64px',
                         u'height': u'64px'})
 
+    def test_dedup(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        self.create_image("simple/copy.png", BLUE)
+        code = self.call("glue simple output --dedup --json")
+        self.assertEqual(code, 0)
+
+        self.assertExists("output/simple.png")
+        self.assertEqual(PILImage.open("output/simple.png").size, (128, 64))
+
+        with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+            data = json.loads(f.read())
+        frames = dict([(f['filename'], f['frame']) for f in data['frames']])
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(frames['blue.png'], frames['copy.png'])
+        self.assertNotEqual(frames['blue.png'], frames['red.png'])
+
     def test_ordering(self):
         settings = {'crop': False, 'padding': '0', 'margin': '0', 'ratios': [1]}
         red_path = self.create_image("simple/red.png", RED, (64, 64))
@@ -545,6 +958,63 @@ class TestGlue(unittest.TestCase):
         assert red < blue
         assert blue < alpha_path
 
+    def test_layout_records(self):
+        settings = {'crop': False, 'padding': '0', 'margin': '0', 'ratios': [1]}
+        paths = [self.create_image("simple/red.png", RED, (64, 32)),
+                 self.create_image("simple/blue.png", BLUE, (32, 32)),
+                 self.create_image("simple/yellow.png", YELLOW, (32, 64)),
+                 self.create_image("simple/pink.png", PINK, (32, 32))]
+
+        for ordering in ['maxside', 'width', 'height', 'area', 'filename',
+                         '-maxside', '-width', '-height', '-area', '-filename']:
+            settings['algorithm_ordering'] = ordering
+            reverse = ordering[0] != '-'
+            ordering = ordering.lstrip('-')
+            images = [Image(path, settings) for path in paths]
+            record_cls = FilenameLayoutRecord if ordering == 'filename' else LayoutRecord
+            records = sorted([record_cls(image, ordering) for image in images], reverse=reverse)
+            self.assertEqual([r.image for r in records], sorted(images, reverse=reverse))
+
+        record = records[0]
+        self.assertEqual(record.absolute_width, record.image.absolute_width)
+        self.assertFalse(hasattr(record, '__dict__'))
+        record.x, record.y = 10, 20
+        record.apply()
+        self.assertEqual((record.image.x, record.image.y), (10, 20))
+
+    def test_layered_config(self):
+        settings = {'crop': False, 'padding': '0', 'margin': '0', 'ratios': [1]}
+        red_path = self.create_image("simple/red.png", RED)
+        with open('simple/sprite.conf', 'w') as f:
+            f.write("[red.png]\nmargin=4\n")
+
+        red = Image(red_path, settings)
+        self.assertTrue(isinstance(red.config, LayeredConfig))
+        self.assertEqual(red.config.overrides, {'margin': '4'})
+        self.assertEqual(red.config['margin'], '4')
+        self.assertEqual(red.config['padding'], '0')
+        self.assertEqual(sorted(red.config.keys()), sorted(settings.keys()))
+
+        red.config['crop'] = True
+        self.assertEqual(settings['crop'], False)
+        self.assertEqual(settings['margin'], '0')
+
+    def test_image_size_probing(self):
+        settings = {'crop': False, 'padding': '0', 'margin': '0', 'ratios': [1]}
+        red_path = self.create_image("simple/red.png", RED, (64, 32), margin=8)
+
+        red = Image(red_path, settings)
+        self.assertEqual((red.width, red.height), (72, 40))
+        self.assertEqual((red.original_width, red.original_height), (72, 40))
+        self.assertFalse('image' in red.__dict__)
+
+        settings['crop'] = True
+        red = Image(red_path, settings)
+        self.assertEqual((red.width, red.height), (64, 32))
+        self.assertEqual((red.original_width, red.original_height), (72, 40))
+        self.assertFalse('image' in red.__dict__)
+        self.assertEqual(red.image.size, (64, 32))
+
     def test_css(self):
         self.create_image("simple/red.png", RED)
         self.create_image("simple/blue.png", BLUE)
@@ -570,6 +1040,222 @@ class TestGlue(unittest.TestCase):
                         u'width': u'64px',
                         u'height': u'64px'})
 
+    def test_hash(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+
+        def css_hash():
+            with codecs.open("output/simple.css", 'r', 'utf-8-sig') as f:
+                return f.readline().split()[-2]
+
+        code = self.call("glue simple output")
+        self.assertEqual(code, 0)
+        first_hash = css_hash()
+
+        code, out = self.call("glue simple output", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("needs rebuild" not in out)
+        self.assertEqual(css_hash(), first_hash)
+
+        self.create_image("simple/blue.png", GREEN)
+        code = self.call("glue simple output")
+        self.assertEqual(code, 0)
+        self.assertNotEqual(css_hash(), first_hash)
+
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --padding=1")
+        self.assertEqual(code, 0)
+        self.assertNotEqual(css_hash(), first_hash)
+
+    def test_fingerprint_cache(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output")
+        self.assertEqual(code, 0)
+        self.assertExists("output/.glue-cache/fingerprints.json")
+
+        # Unchanged source files are not read
+        with patch('glue.core.Image._image_data') as mocked_data:
+            mocked_data.__get__ = Mock(return_value="")
+            code, out = self.call("glue simple output", capture=True)
+            self.assertEqual(code, 0)
+            self.assertFalse(mocked_data.__get__.called)
+        self.assertTrue("needs rebuild" not in out)
+
+        self.create_image("simple/blue.png", GREEN)
+        os.utime("simple/blue.png", (0, 0))
+        code, out = self.call("glue simple output", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("needs rebuild" in out)
+        self.assertColor("output/simple.png", GREEN, ((64, 0), (127, 63)))
+
+    def test_up_to_date(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --json")
+        self.assertEqual(code, 0)
+
+        with patch('glue.core.Sprite.process') as mocked_process:
+            code, out = self.call("glue simple output --json", capture=True)
+            self.assertEqual(code, 0)
+            self.assertFalse(mocked_process.called)
+        self.assertTrue("needs rebuild" not in out)
+
+        code, out = self.call("glue simple output --json --margin=1", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("needs rebuild" in out)
+
+    def test_manifest(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --html --retina")
+        self.assertEqual(code, 0)
+        self.assertExists("output/glue-manifest.json")
+
+        with open("output/glue-manifest.json") as f:
+            manifest = json.load(f)
+        self.assertEqual(sorted(manifest['sprites']['simple'].keys()), ['css', 'html', 'img'])
+        self.assertEqual(sorted(manifest['sprites']['simple']['img']['outputs'].keys()),
+                         ['simple.png', 'simple@2x.png'])
+
+        with patch('glue.formats.img.ImageFormat.needs_rebuild') as mocked_img:
+            with patch('glue.formats.css.CssFormat.needs_rebuild') as mocked_css:
+                code, out = self.call("glue simple output --html --retina", capture=True)
+                self.assertEqual(code, 0)
+                self.assertFalse(mocked_img.called)
+                self.assertFalse(mocked_css.called)
+        self.assertTrue("needs rebuild" not in out)
+
+        os.remove("output/simple@2x.png")
+        code, out = self.call("glue simple output --html --retina", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("Format 'img' for sprite 'simple' needs rebuild" in out)
+        self.assertTrue("Format 'css' for sprite 'simple' needs rebuild" not in out)
+        self.assertExists("output/simple@2x.png")
+
+    def test_format_hash_without_manifest(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --url=http://a/ --json --css")
+        self.assertEqual(code, 0)
+
+        # Format only settings are detected even without a manifest
+        os.remove("output/glue-manifest.json")
+        for i in range(2):
+            code = self.call("glue simple output --url=http://b/ --json --json-format=hash --css")
+            self.assertEqual(code, 0)
+
+        with open("output/simple.css") as f:
+            css = f.read()
+        self.assertTrue("http://b/simple.png" in css)
+        self.assertTrue("http://a/" not in css)
+        with codecs.open('output/simple.json', 'r', 'utf-8-sig') as f:
+            self.assertTrue(isinstance(json.loads(f.read())['frames'], dict))
+
+        # Nothing is rebuilt if nothing has changed
+        os.remove("output/glue-manifest.json")
+        code, out = self.call("glue simple output --url=http://b/ --json --json-format=hash --css",
+                              capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("needs rebuild" not in out)
+
+    def test_format_hash(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --json --css")
+        self.assertEqual(code, 0)
+
+        code, out = self.call("glue simple output --json --css --namespace=custom", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("Format 'img' for sprite 'simple' needs rebuild" not in out)
+        self.assertTrue("Format 'json' for sprite 'simple' needs rebuild" not in out)
+        self.assertTrue("Format 'css' for sprite 'simple' needs rebuild" in out)
+
+        code, out = self.call("glue simple output --json --css --json-format=hash", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("Format 'img' for sprite 'simple' needs rebuild" not in out)
+        self.assertTrue("Format 'json' for sprite 'simple' needs rebuild" in out)
+
+        with open('simple/sprite.conf', 'w') as f:
+            f.write("[blue.png]\nmargin=4\n")
+
+        code, out = self.call("glue simple output --json --css", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("Format 'img' for sprite 'simple' needs rebuild" in out)
+        self.assertTrue("Format 'json' for sprite 'simple' needs rebuild" in out)
+
+    def test_image_cache(self):
+        self.create_image("simple/red.png", RED, margin=4)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --crop")
+        self.assertEqual(code, 0)
+        self.assertEqual(len(os.listdir("output/.glue-cache/images")), 2)
+        with open("output/simple.png", "rb") as f:
+            sprite = f.read()
+
+        with patch('glue.core.decode_image') as mocked_decode:
+            code = self.call("glue simple output --crop --force")
+            self.assertEqual(code, 0)
+            self.assertFalse(mocked_decode.called)
+
+        with open("output/simple.png", "rb") as f:
+            self.assertEqual(f.read(), sprite)
+
+        # Cropped and non-cropped images are different entries
+        code = self.call("glue simple output")
+        self.assertEqual(code, 0)
+        self.assertEqual(len(os.listdir("output/.glue-cache/images")), 4)
+
+        # The least recently used entries are removed once the cache is full
+        self.create_image("simple/blue.png", GREEN)
+        code = self.call("glue simple output --cache-size=0")
+        self.assertEqual(code, 0)
+        self.assertEqual(os.listdir("output/.glue-cache/images"), [])
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), "Requires /proc")
+    def test_image_cache_closes_files(self):
+        cache = ImageCache.get("output", 1024 * 1024)
+        image = PILImage.new('RGBA', (4, 2), RED)
+        cache.store('digest', False, (4, 2), (0, 0, 4, 2), image.tobytes())
+
+        open_files = len(os.listdir('/proc/self/fd'))
+        loaded = [cache.load('digest', False) for i in range(10)]
+        self.assertEqual(len(os.listdir('/proc/self/fd')), open_files)
+        self.assertEqual(loaded[0][2].tobytes(), image.tobytes())
+
+    def test_no_cache(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --no-cache")
+        self.assertEqual(code, 0)
+        self.assertExists("output/simple.png")
+        self.assertDoesNotExists("output/.glue-cache")
+
+    def test_crop_decodes_once(self):
+        self.create_image("simple/red.png", RED, margin=4)
+        self.create_image("simple/blue.png", BLUE, margin=2)
+        with patch('glue.core.decode_image', side_effect=decode_image) as mocked_decode:
+            code = self.call("glue simple output --crop --no-cache --jobs=1")
+            self.assertEqual(code, 0)
+            self.assertEqual(mocked_decode.call_count, 2)
+
+    def test_hash_working_directory(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --ratios=2,1.5,1")
+        self.assertEqual(code, 0)
+
+        os.mkdir("other")
+        os.chdir("other")
+        code, out = self.call("glue ../simple ../output --ratios=1,1.5,2", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("needs rebuild" not in out)
+
+        os.remove("../output/glue-manifest.json")
+        code, out = self.call("glue ../simple ../output --ratios=1,1.5,2", capture=True)
+        self.assertEqual(code, 0)
+        self.assertTrue("needs rebuild" not in out)
+
     def test_css_validation(self):
         self.create_image("simple/red.png", RED)
         self.create_image("simple/sub/red.png", RED)
@@ -1168,6 +1854,47 @@ class TestGlue(unittest.TestCase):
                         u'width': u'64px',
                         u'height': u'64px'})
 
+    def test_jobs(self):
+        self.create_image("simple/red.png", RED, margin=4)
+        self.create_image("simple/blue.png", BLUE, (32, 32), margin=8)
+        self.create_image("simple/green.png", GREEN, (16, 48))
+
+        outputs = []
+        for options in ("", " --jobs=2"):
+            code = self.call("glue simple output --crop --json --force" + options)
+            self.assertEqual(code, 0)
+            outputs.append([open(os.path.join("output", f), "rb").read()
+                            for f in ("simple.png", "simple.json")])
+
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_jobs_ratios_and_sprites(self):
+        self.create_image("multiple/icons/red.png", RED)
+        self.create_image("multiple/icons/blue.png", BLUE)
+        self.create_image("multiple/logos/green.png", GREEN, (32, 48))
+
+        filenames = ["{0}{1}.png".format(name, suffix)
+                     for name in ("icons", "logos") for suffix in ("@3x", "@2x", "")]
+
+        outputs = []
+        for options in ("", " --jobs=4"):
+            code = self.call("glue multiple output --project --ratios=3,2,1 --force" + options)
+            self.assertEqual(code, 0)
+            outputs.append([open(os.path.join("output", f), "rb").read() for f in filenames])
+
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_jobs_first_build(self):
+        for name in ("icons", "logos", "flags", "arrows"):
+            for color in (RED, BLUE, GREEN):
+                self.create_image("multiple/{0}/{1}.png".format(name, "-".join(map(str, color))), color)
+
+        code = self.call("glue multiple output --project --ratios=3,2,1 --jobs=4 --img=output/img/a/b")
+        self.assertEqual(code, 0)
+        for name in ("icons", "logos", "flags", "arrows"):
+            for suffix in ("@3x", "@2x", ""):
+                self.assertExists("output/img/a/b/{0}{1}.png".format(name, suffix))
+
     def test_padding(self):
         self.create_image("simple/red.png", RED)
         self.create_image("simple/blue.png", BLUE)
@@ -1396,6 +2123,41 @@ class TestGlue(unittest.TestCase):
                         u'width': u'64px',
                         u'height': u'64px'})
 
+    def test_png_writer(self):
+        self.create_image("simple/red.png", RED, margin=4)
+        self.create_image("simple/blue.png", (0, 0, 255, 128), (32, 48))
+        self.create_image("simple/green.png", GREEN, (16, 16))
+
+        for options in ("--ratios=2,1", "--png8"):
+            code = self.call("glue simple pillow " + options)
+            self.assertEqual(code, 0)
+            code = self.call("glue simple parallel --png-writer=parallel --jobs=2 " + options)
+            self.assertEqual(code, 0)
+
+            for filename in os.listdir("pillow"):
+                if filename.endswith('.png'):
+                    expected = PILImage.open(os.path.join("pillow", filename))
+                    image = PILImage.open(os.path.join("parallel", filename))
+                    self.assertEqual(image.mode, expected.mode)
+                    self.assertEqual(image.tobytes(), expected.tobytes())
+                    self.assertEqual(image.info['Software'], expected.info['Software'])
+                    self.assertEqual(image.info['Comment'], expected.info['Comment'])
+
+    def test_write_png_bands(self):
+        image = PILImage.frombytes('RGBA', (37, 29), os.urandom(37 * 29 * 4))
+        write_png(image, "bands.png", text=[('Comment', 'bands')], threads=3, band_size=200)
+        written = PILImage.open("bands.png")
+        self.assertEqual(written.mode, 'RGBA')
+        self.assertEqual(written.tobytes(), image.tobytes())
+        self.assertEqual(written.info['Comment'], 'bands')
+
+        # zlib checks the checksum stitched together from every band
+        with open("bands.png", "rb") as f:
+            data = f.read()
+        start = data.index('IDAT') + 4
+        length = struct.unpack('>I', data[start - 8:start - 4])[0]
+        self.assertEqual(len(zlib.decompress(data[start:start + length])), (37 * 4 + 1) * 29)
+
     def test_retina(self):
 
         self.create_image("simple/red.png", RED)
@@ -1446,6 +2208,29 @@ class TestGlue(unittest.TestCase):
                         u'width': u'32px',
                         u'height': u'32px'}, ratio=2)
 
+    def test_ratios_only_stale_images(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        code = self.call("glue simple output --ratios=3,2,1")
+        self.assertEqual(code, 0)
+
+        for path in ("output/simple@3x.png", "output/simple@2x.png"):
+            os.utime(path, (1, 1))
+        os.remove("output/simple.png")
+
+        # Only the missing image is saved again
+        code = self.call("glue simple output --ratios=3,2,1")
+        self.assertEqual(code, 0)
+        self.assertExists("output/simple.png")
+        self.assertEqual(PILImage.open("output/simple.png").size, (43, 22))
+        self.assertEqual(os.path.getmtime("output/simple@3x.png"), 1)
+        self.assertEqual(os.path.getmtime("output/simple@2x.png"), 1)
+
+        code = self.call("glue simple output --ratios=3,2,1 --force")
+        self.assertEqual(code, 0)
+        self.assertNotEqual(os.path.getmtime("output/simple@3x.png"), 1)
+        self.assertNotEqual(os.path.getmtime("output/simple@2x.png"), 1)
+
     def test_retina_url(self):
         self.create_image("simple/red.png", RED)
         self.create_image("simple/blue.png", BLUE)
@@ -1654,6 +2439,32 @@ class TestGlue(unittest.TestCase):
                         u'width': u'64px',
                         u'height': u'64px'})
 
+    def test_config_files_cache(self):
+        self.create_image("simple/red.png", RED)
+        self.create_image("simple/blue.png", BLUE)
+        self.create_image("simple/green.png", GREEN)
+
+        with open('simple/sprite.conf', 'w') as f:
+            f.write("[sprite]\nalgorithm=vertical\n[blue.png]\nmargin=4\n")
+
+        read = ConfigParser.RawConfigParser.read
+        with patch.object(ConfigParser.RawConfigParser, 'read', autospec=True,
+                          side_effect=read) as mocked_read:
+            code = self.call("glue simple output")
+            self.assertEqual(code, 0)
+            self.assertEqual(mocked_read.call_count, 1)
+
+            # Changes on the file invalidate the cache
+            with open('simple/sprite.conf', 'w') as f:
+                f.write("[sprite]\nalgorithm=horizontal\n")
+            os.utime('simple/sprite.conf', (0, 0))
+
+            code = self.call("glue simple output")
+            self.assertEqual(code, 0)
+            self.assertEqual(mocked_read.call_count, 2)
+
+        self.assertColor("output/simple.png", BLUE, ((128, 0), (191, 63)))
+
     def test_pseudo_class(self):
         self.create_image("simple/button.png", RED)
         self.create_image("simple/button__hover.png", BLUE)